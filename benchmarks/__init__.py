@@ -0,0 +1,37 @@
+"""
+Benchmarks of KU Polls, run them from the project directory, e.g.
+
+    python -m benchmarks.asgi_vs_wsgi
+
+Every benchmark runs against a fresh test database.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+
+def setup_django(database=True, on_disk=False):
+    """
+    Configure Django and create an empty test database.
+
+    SQLite test databases live in memory, where concurrent writers fail
+    with "database table is locked" instead of waiting. on_disk puts
+    the database in a temporary file, for benchmarks that write from
+    several threads.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+    import django
+    django.setup()
+    if not database:
+        return
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    if on_disk and connection.vendor == 'sqlite':
+        directory = tempfile.mkdtemp(prefix='polls-benchmark-')
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'db.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
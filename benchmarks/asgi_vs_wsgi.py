@@ -0,0 +1,92 @@
+"""
+Compare the sync views under WSGI with the async views under ASGI.
+
+Both paths get the same number of concurrent requests for the results
+page. The WSGI path needs a thread per concurrent request, the ASGI path
+serves them from one event loop.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+
+def create_question(choices):
+    from polls.models import Choice, Question
+    question = Question.objects.create(question_text="Benchmark question")
+    Choice.objects.bulk_create(
+        Choice(question=question, choice_text=f"Choice {n}", votes=n)
+        for n in range(choices))
+    return question
+
+
+def run_wsgi(url, requests, concurrency):
+    from django.test import Client
+    peak_threads = threading.active_count()
+
+    def fetch(_):
+        nonlocal peak_threads
+        peak_threads = max(peak_threads, threading.active_count())
+        return Client().get(url).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(fetch, range(requests)))
+    return time.perf_counter() - start, statuses, peak_threads
+
+
+def run_asgi(url, requests, concurrency):
+    from django.test import AsyncClient, override_settings
+    peak_threads = threading.active_count()
+
+    async def fetch_all():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            nonlocal peak_threads
+            async with limit:
+                peak_threads = max(peak_threads, threading.active_count())
+                response = await AsyncClient().get(url)
+                return response.status_code
+
+        return await asyncio.gather(*(fetch() for _ in range(requests)))
+
+    with override_settings(ROOT_URLCONF='mysite.asgi_urls'):
+        start = time.perf_counter()
+        statuses = asyncio.run(fetch_all())
+        return time.perf_counter() - start, statuses, peak_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--choices', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.urls import reverse
+    question = create_question(args.choices)
+    url = reverse('polls:results', args=(question.id,))
+
+    report = {}
+    for name, run in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+        elapsed, statuses, peak_threads = run(url, args.requests,
+                                              args.concurrency)
+        report[name] = {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(args.requests / elapsed, 1),
+            'errors': sum(status != 200 for status in statuses),
+            'peak_threads': peak_threads,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic polls data for the benchmarks.
+
+    python -m benchmarks.data --questions 100 --votes 10000
+
+builds the data in a fresh test database and prints how long it took.
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+from benchmarks import setup_django
+
+BATCH_SIZE = 2000
+
+
+@dataclass
+class Dataset:
+    """
+    The ids of generated data.
+
+    Attributes:
+        question_ids (list) : Open questions, newest first.
+        choice_ids (dict) : Choice ids of each question id.
+        user_ids (list) : Voters.
+    """
+    question_ids: list = field(default_factory=list)
+    choice_ids: dict = field(default_factory=dict)
+    user_ids: list = field(default_factory=list)
+
+
+def generate(questions=100, choices=4, users=1000, votes=10000, seed=0):
+    """
+    Create published, open questions with their choices, users and
+    votes. Every user votes at most once per question, so votes is capped
+    at users * questions. Vote counters are consistent with the votes.
+
+    Return :
+        Dataset: the ids of what was created.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from polls.counters import reconcile
+    from polls.models import Choice, Question, Vote
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    dataset = Dataset()
+
+    Question.objects.bulk_create(
+        (Question(question_text=f"Benchmark question {n}?",
+                  pub_date=now - datetime.timedelta(minutes=n + 1),
+                  end_date=now + datetime.timedelta(days=30))
+         for n in range(questions)), batch_size=BATCH_SIZE)
+    dataset.question_ids = list(
+        Question.objects.order_by('-pub_date', '-id')
+        .values_list('pk', flat=True)[:questions])
+
+    Choice.objects.bulk_create(
+        (Choice(question_id=question_id, choice_text=f"Choice {n}")
+         for question_id in dataset.question_ids
+         for n in range(choices)), batch_size=BATCH_SIZE)
+    for question_id, choice_id in (
+            Choice.objects.filter(question_id__in=dataset.question_ids)
+            .values_list('question_id', 'pk')):
+        dataset.choice_ids.setdefault(question_id, []).append(choice_id)
+
+    # One hash for every account, hashing thousands would dominate.
+    password = make_password("benchmark-password")
+    User.objects.bulk_create(
+        (User(username=f"bench{n}", password=password)
+         for n in range(users)), batch_size=BATCH_SIZE)
+    dataset.user_ids = list(
+        User.objects.filter(username__startswith='bench')
+        .values_list('pk', flat=True))
+
+    votes = min(votes, len(dataset.user_ids) * len(dataset.question_ids))
+    pairs = set()
+    while len(pairs) < votes:
+        pairs.add((rng.choice(dataset.user_ids),
+                   rng.choice(dataset.question_ids)))
+    Vote.objects.bulk_create(
+        (Vote(user_id=user_id, question_id=question_id,
+              choice_id=rng.choice(dataset.choice_ids[question_id]))
+         for user_id, question_id in pairs), batch_size=BATCH_SIZE)
+    for start in range(0, len(dataset.question_ids), 500):
+        reconcile(dataset.question_ids[start:start + 500])
+    return dataset
+
+
+def add_arguments(parser):
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--choices', type=int, default=4)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--votes', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def generate_from_args(args):
+    return generate(questions=args.questions, choices=args.choices,
+                    users=args.users, votes=args.votes, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    setup_django()
+    start = time.perf_counter()
+    dataset = generate_from_args(args)
+    print(json.dumps({
+        'questions': len(dataset.question_ids),
+        'users': len(dataset.user_ids),
+        'seconds': round(time.perf_counter() - start, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
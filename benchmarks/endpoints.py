@@ -0,0 +1,278 @@
+"""
+Latency and throughput of the four polls endpoints.
+
+    python -m benchmarks.endpoints --mode both -o before.json
+
+Builds synthetic data (see benchmarks.data), then sends requests to
+polls:index, polls:detail, polls:results and polls:vote, in turn, from
+concurrent clients. The client mode calls the views through the Django
+test client, the server mode sends HTTP requests to a threaded WSGI
+server started in this process. Compare two reports with
+
+    python -m benchmarks.endpoints --compare before.json after.json
+"""
+import argparse
+import datetime
+import http.client
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks import data, setup_django
+
+ENDPOINTS = ('index', 'detail', 'results', 'vote')
+# A fixed token passes the CSRF check when sent as cookie and header.
+CSRF_TOKEN = 'b' * 32
+
+
+def percentile(sorted_values, fraction):
+    """ Return the nearest-rank percentile of sorted values. """
+    if not sorted_values:
+        return None
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    """ Return the statistics of one endpoint, latencies in ms. """
+    latencies = sorted(latencies)
+    stats = {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0,
+    }
+    for name, fraction in (('p50', .5), ('p95', .95), ('p99', .99)):
+        value = percentile(latencies, fraction)
+        stats[name] = round(value * 1000, 3) if value is not None else None
+    return stats
+
+
+def build_requests(endpoint, dataset, sessions, count, rng):
+    """
+    Return count requests to an endpoint, each a tuple of method, path,
+    form data and session key.
+    """
+    from django.urls import reverse
+    requests = []
+    for _ in range(count):
+        question_id = rng.choice(dataset.question_ids)
+        session = rng.choice(sessions)
+        body = None
+        if endpoint == 'index':
+            path = reverse('polls:index')
+        elif endpoint == 'vote':
+            path = reverse('polls:vote', args=(question_id,))
+            body = {'choice': rng.choice(dataset.choice_ids[question_id])}
+        else:
+            path = reverse(f'polls:{endpoint}', args=(question_id,))
+        requests.append(('POST' if body else 'GET', path, body, session))
+    return requests
+
+
+def login_sessions(user_ids, count):
+    """ Return session keys of count logged in users. """
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+    keys = []
+    for user in User.objects.filter(pk__in=user_ids[:count]):
+        client = Client()
+        client.force_login(user)
+        keys.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+    return keys
+
+
+def client_sender():
+    """ Return a function that sends a request with the test client. """
+    from django.conf import settings
+    from django.test import Client
+    local = threading.local()
+
+    def send(method, path, body, session):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        local.client.cookies[settings.SESSION_COOKIE_NAME] = session
+        if method == 'POST':
+            response = local.client.post(path, body)
+        else:
+            response = local.client.get(path)
+        return response.status_code
+
+    return send
+
+
+def server_sender(address):
+    """ Return a function that sends a request over HTTP to address. """
+    from django.conf import settings
+    host, port = address
+
+    def send(method, path, body, session):
+        cookies = (f'{settings.SESSION_COOKIE_NAME}={session}; '
+                   f'{settings.CSRF_COOKIE_NAME}={CSRF_TOKEN}')
+        headers = {'Cookie': cookies}
+        payload = None
+        if method == 'POST':
+            payload = urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = CSRF_TOKEN
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    return send
+
+
+def start_server():
+    """
+    Serve the WSGI application from a thread.
+
+    Return :
+        tuple: the server and its (host, port) address.
+    """
+    from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                              WSGIRequestHandler)
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[:2]
+
+
+def run(send, requests, concurrency):
+    """ Send requests from concurrent clients and summarize them. """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def fetch(request):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = send(*request) < 400
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fetch, requests))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """ Return the relative change of every latency and throughput. """
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    changes = {}
+    for mode, endpoints in after['results'].items():
+        for endpoint, stats in endpoints.items():
+            old = before['results'].get(mode, {}).get(endpoint)
+            if not old:
+                continue
+            changes[f'{mode}.{endpoint}'] = {
+                key: (f"{(stats[key] - old[key]) / old[key]:+.1%}"
+                      if old[key] and stats[key] is not None else None)
+                for key in ('p50', 'p95', 'p99', 'throughput')
+            }
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--mode', choices=('client', 'server', 'both'),
+                        default='both')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS,
+                        default=list(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=500,
+                        help="Requests per endpoint.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--sessions', type=int, default=50,
+                        help="Number of logged in users sending requests.")
+    parser.add_argument('-o', '--output',
+                        help="Write the report to this file.")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help="Compare two reports instead of running.")
+    data.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    setup_django(on_disk=True)
+    from django.conf import settings
+    from django.test.utils import override_settings
+    dataset = data.generate_from_args(args)
+    sessions = login_sessions(dataset.user_ids, args.sessions)
+    rng = random.Random(args.seed)
+
+    modes = ('client', 'server') if args.mode == 'both' else (args.mode,)
+    results = {}
+    # The server is reached as 127.0.0.1:<port>, not as testserver.
+    with override_settings(ALLOWED_HOSTS=['*']):
+        for mode in modes:
+            server = None
+            if mode == 'server':
+                server, address = start_server()
+                send = server_sender(address)
+            else:
+                send = client_sender()
+            results[mode] = {}
+            for endpoint in args.endpoints:
+                requests = build_requests(endpoint, dataset, sessions,
+                                          args.requests, rng)
+                results[mode][endpoint] = run(send, requests,
+                                              args.concurrency)
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': settings.DATABASES['default']['ENGINE'],
+        'options': {key: value for key, value in vars(args).items()
+                    if key not in ('output', 'compare')},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure password hashing throughput in accounts per second.
+
+Compares hashing on one thread, on concurrent signup threads sharing
+the bounded hashing slots and on the process pool of provision_users.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+
+def measure(accounts, hash_all):
+    passwords = [f"password-{n}" for n in range(accounts)]
+    start = time.perf_counter()
+    hash_all(passwords)
+    elapsed = time.perf_counter() - start
+    return {'accounts': accounts,
+            'seconds': round(elapsed, 3),
+            'accounts_per_second': round(accounts / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--accounts', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    setup_django(database=False)
+    from django.contrib.auth.hashers import make_password
+    from django.test import override_settings
+    from mysite.hashing import hash_password, hash_passwords, hashing_pool
+
+    def serial(passwords):
+        return [make_password(password) for password in passwords]
+
+    def signup_threads(passwords):
+        with ThreadPoolExecutor(max_workers=len(passwords)) as clients:
+            return list(clients.map(hash_password, passwords))
+
+    with hashing_pool(args.workers) as pool:
+        hash_passwords(pool, ["warm-up"] * args.workers)
+        report = {
+            'serial': measure(args.accounts, serial),
+            'process_pool': measure(
+                args.accounts,
+                lambda passwords: hash_passwords(pool, passwords)),
+        }
+    with override_settings(PASSWORD_HASHING_WORKERS=args.workers,
+                           PASSWORD_HASHING_QUEUE=args.accounts,
+                           PASSWORD_HASHING_TIMEOUT=None):
+        report['signup_slots'] = measure(args.accounts, signup_threads)
+    report['workers'] = args.workers
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Session table reads and writes per request, for each session engine.
+
+    python -m benchmarks.sessions --requests 200
+
+Runs the same anonymous and logged in page views with every profile and
+counts the queries on django_session, so the writes saved by keeping
+messages in a cookie and sessions in the cache or in a signed cookie
+show per request.
+"""
+import argparse
+import json
+import time
+
+from benchmarks import setup_django
+
+SESSIONS = 'django.contrib.sessions.backends.'
+MESSAGES = 'django.contrib.messages.storage.'
+# Session engine and message storage of each profile.
+PROFILES = {
+    'db_session_messages': (SESSIONS + 'db',
+                            MESSAGES + 'session.SessionStorage'),
+    'db': (SESSIONS + 'db', MESSAGES + 'fallback.FallbackStorage'),
+    'cached_db': (SESSIONS + 'cached_db',
+                  MESSAGES + 'fallback.FallbackStorage'),
+    'signed_cookies': (SESSIONS + 'signed_cookies',
+                       MESSAGES + 'fallback.FallbackStorage'),
+}
+
+
+def scenarios(question, choice):
+    from django.urls import reverse
+    results = reverse('polls:results', args=(question.id,))
+    return {
+        'anonymous_index': (False, 'get', reverse('polls:index'), None),
+        'anonymous_results': (False, 'get', results, None),
+        'anonymous_error_redirect': (
+            False, 'get', reverse('polls:detail', args=(question.id + 1,)),
+            None),
+        'user_results': (True, 'get', results, None),
+        'user_vote': (True, 'post',
+                      reverse('polls:vote', args=(question.id,)),
+                      {'choice': choice.id}),
+    }
+
+
+def measure(user, logged_in, method, url, data, requests):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    client = Client()
+    if logged_in:
+        client.force_login(user)
+    reads = writes = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as context:
+            getattr(client, method)(url, data)
+        for query in context.captured_queries:
+            if 'django_session' not in query['sql']:
+                continue
+            if query['sql'].startswith('SELECT'):
+                reads += 1
+            else:
+                writes += 1
+    elapsed = time.perf_counter() - start
+    return {'session_reads_per_request': round(reads / requests, 3),
+            'session_writes_per_request': round(writes / requests, 3),
+            'ms_per_request': round(elapsed / requests * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.test import override_settings
+    from polls.models import Choice, Question
+    question = Question.objects.create(question_text="Benchmark question")
+    choice = Choice.objects.create(question=question, choice_text="Choice")
+    user = User.objects.create_user(username="benchmark", password="secret")
+
+    report = {}
+    for name, (engine, storage) in PROFILES.items():
+        cache.clear()
+        report[name] = {}
+        with override_settings(SESSION_ENGINE=engine,
+                               MESSAGE_STORAGE=storage):
+            for scenario, (logged_in, method, url, data) in scenarios(
+                    question, choice).items():
+                report[name][scenario] = measure(user, logged_in, method,
+                                                 url, data, args.requests)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Many voters at once against an on-disk SQLite database.
+
+    python -m benchmarks.vote_stress --voters 200 --concurrency 32
+    python -m benchmarks.vote_stress --high-concurrency
+
+Every voter votes once through the vote view, all from concurrent
+threads, then the votes and the counters are checked. Lost votes are
+votes that were not saved, whether the view failed or said the poll
+was busy.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--voters', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--choices', type=int, default=4)
+    parser.add_argument('--high-concurrency', action='store_true',
+                        help="Use the SQLITE_HIGH_CONCURRENCY backend.")
+    args = parser.parse_args()
+
+    os.environ['SQLITE_HIGH_CONCURRENCY'] = str(args.high_concurrency)
+    setup_django(on_disk=True)
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.db.models import Sum
+    from django.test import Client
+    from django.urls import reverse
+    from polls.models import Choice, Question, Vote
+
+    question = Question.objects.create(question_text="Stress question")
+    choices = Choice.objects.bulk_create(
+        Choice(question=question, choice_text=f"Choice {n}")
+        for n in range(args.choices))
+    password = make_password("stress-password")
+    User.objects.bulk_create(User(username=f"voter{n}", password=password)
+                             for n in range(args.voters))
+    clients = []
+    for number, user in enumerate(User.objects.order_by('pk')):
+        client = Client()
+        client.force_login(user)
+        clients.append((client, choices[number % len(choices)].pk))
+    url = reverse('polls:vote', args=(question.id,))
+    saved = reverse('polls:results', args=(question.id,))
+
+    def vote(voter):
+        client, choice_id = voter
+        try:
+            response = client.post(url, {'choice': choice_id})
+        except Exception as error:
+            return type(error).__name__
+        if response.status_code == 302 and response.url == saved:
+            return 'saved'
+        return 'busy' if response.status_code == 302 else 'error'
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(vote, clients))
+    elapsed = time.perf_counter() - start
+
+    question.refresh_from_db()
+    votes = Vote.objects.filter(question=question).count()
+    counted = Choice.objects.filter(question=question).aggregate(
+        total=Sum('votes'))['total']
+    print(json.dumps({
+        'engine': settings.DATABASES['default']['ENGINE'],
+        'voters': args.voters,
+        'concurrency': args.concurrency,
+        'seconds': round(elapsed, 3),
+        'votes_per_second': round(args.voters / elapsed, 1),
+        'outcomes': {outcome: outcomes.count(outcome)
+                     for outcome in sorted(set(outcomes))},
+        'lost_votes': args.voters - votes,
+        'counters_match': votes == counted == question.total_votes,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
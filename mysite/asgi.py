@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+# Serve the native async polls views, see mysite.asgi_urls.
+os.environ.setdefault("POLLS_ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
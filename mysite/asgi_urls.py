@@ -0,0 +1,18 @@
+"""
+URL configuration used under ASGI, it serves the async polls views.
+
+Select it with POLLS_ASYNC_VIEWS=True, which mysite.asgi sets by default.
+"""
+from django.contrib import admin
+from django.urls import include, path
+from django.views.generic import RedirectView
+from . import views
+
+urlpatterns = [
+    path('', RedirectView.as_view(pattern_name='polls:index', permanent=True)),
+    path('polls/', include('polls.async_urls')),
+    path('accounts/', include('django.contrib.auth.urls')),
+    path('signup/', views.signup, name='signup'),
+    path('admin/', admin.site.urls),
+    path('metrics', views.metrics, name='metrics'),
+]
@@ -0,0 +1,37 @@
+"""Database helpers shared by the views and the management commands."""
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+_LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_locked(error):
+    """ Return True if error is SQLite giving up on a locked database. """
+    return (isinstance(error, OperationalError)
+            and str(error).startswith(_LOCKED_MESSAGES))
+
+
+def retry_on_locked(func, *args, **kwargs):
+    """
+    Call func, and call it again after a short, growing and jittered
+    sleep while it fails because the database is locked, at most
+    settings.DATABASE_LOCK_RETRIES more times.
+
+    func must run its own transaction, so that a retry starts over.
+
+    Raise :
+        OperationalError: the last lock error, if every attempt failed.
+    """
+    retries = settings.DATABASE_LOCK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as error:
+            if attempt == retries or not is_locked(error):
+                raise
+            delay = min(settings.DATABASE_LOCK_BACKOFF * 2 ** attempt,
+                        settings.DATABASE_LOCK_BACKOFF_MAX)
+            time.sleep(random.uniform(0, delay))
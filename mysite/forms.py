@@ -0,0 +1,25 @@
+from django.contrib.auth.forms import UserCreationForm
+
+from .hashing import hashing_slot
+
+
+class SignupForm(UserCreationForm):
+    """
+    UserCreationForm that hashes the password in one of the bounded
+    hashing slots.
+    """
+
+    def save(self, commit=True):
+        """
+        Save the new user.
+
+        Raise :
+            HashingBusy: if the password could not be hashed in time.
+        """
+        with hashing_slot():
+            user = super().save(commit=False)
+        if commit:
+            user.save()
+            if hasattr(self, "save_m2m"):
+                self.save_m2m()
+        return user
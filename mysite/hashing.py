@@ -0,0 +1,100 @@
+"""
+Bounded password hashing.
+
+Signup hashes the password on its own request thread. PBKDF2 in hashlib
+releases the GIL, so concurrent signups already hash in parallel. What
+needs bounding is how many do so at once: a burst of signups would
+otherwise keep every web worker busy hashing. Signups wait for one of a
+few hashing slots, and give up with HashingBusy when too many are
+waiting or none frees up in time. Bulk provisioning hashes with a
+process pool instead.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+from .metrics import Gauge
+
+
+class HashingBusy(Exception):
+    """ Raised when no password hashing slot frees up in time. """
+
+
+HASHES_IN_FLIGHT = Gauge(
+    'polls_password_hashes_in_flight',
+    "Signups hashing a password or waiting for a hashing slot.")
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _get_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _slots = (threading.BoundedSemaphore(
+                          workers + settings.PASSWORD_HASHING_QUEUE),
+                      threading.BoundedSemaphore(workers))
+        return _slots
+
+
+@contextmanager
+def hashing_slot():
+    """
+    Hold one of the PASSWORD_HASHING_WORKERS hashing slots in the block.
+
+    Raise :
+        HashingBusy: if PASSWORD_HASHING_QUEUE threads wait for a slot
+        already, or none frees up within PASSWORD_HASHING_TIMEOUT
+        seconds.
+    """
+    admitted, running = _get_slots()
+    if not admitted.acquire(blocking=False):
+        raise HashingBusy("Too many passwords are being hashed.")
+    HASHES_IN_FLIGHT.inc()
+    try:
+        if not running.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+            raise HashingBusy("Too many passwords are being hashed.")
+        try:
+            yield
+        finally:
+            running.release()
+    finally:
+        HASHES_IN_FLIGHT.dec()
+        admitted.release()
+
+
+def hash_password(raw_password):
+    """
+    Hash a password on the calling thread, in a hashing slot.
+
+    Raise :
+        HashingBusy: if no hashing slot frees up in time.
+    """
+    with hashing_slot():
+        return make_password(raw_password)
+
+
+def _setup_worker():
+    django.setup()
+
+
+def hashing_pool(workers=None):
+    """ Return a process pool to use with hash_passwords(). """
+    return ProcessPoolExecutor(max_workers=workers,
+                               initializer=_setup_worker)
+
+
+def hash_passwords(pool, raw_passwords, chunksize=1):
+    """
+    Hash many passwords across the processes of a hashing_pool().
+
+    Return :
+        list: the hashes in the order of raw_passwords.
+    """
+    return list(pool.map(make_password, raw_passwords, chunksize=chunksize))
@@ -0,0 +1,376 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in the memory of each process. When
+settings.METRICS_DIR is set, every process also writes its metrics to a
+file of that directory, and the /metrics page adds up the files, so any
+worker of a multi-process server reports the metrics of all of them.
+Counters and histograms of workers that exited are kept, gauges are only
+reported for running workers, labelled by pid.
+
+Each file is named after the pid and the start time of its process, so
+a worker that gets the pid of an exited one does not overwrite its
+counts. The files of exited workers are folded into one retired.json
+file when /metrics is read, so recycled workers do not fill the
+directory.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover, not on Windows
+    fcntl = None
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    """
+    A named metric with a value for each combination of its labels.
+
+    Attributes:
+        name (str) : Name of the metric.
+        documentation (str) : Help text of the metric.
+        labelnames (tuple) : Names of the labels of its values.
+    """
+    kind = None
+    _registry = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} has labels {self.labelnames}, "
+                             f"got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _changed(self):
+        if self._registry is not None:
+            self._registry.changed()
+
+    def samples(self):
+        """ Return a JSON-friendly copy of the values. """
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    """ A count that only goes up. """
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("A counter cannot go down.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._changed()
+
+
+class Gauge(Metric):
+    """ A value that goes up and down. """
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        self._changed()
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._changed()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """ Observations counted in buckets of upper bounds. """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None,
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0.0,
+                    'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+        self._changed()
+
+    @contextmanager
+    def time(self, **labels):
+        """ Observe the seconds the block takes. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), {'buckets': list(state['buckets']),
+                                 'sum': state['sum'],
+                                 'count': state['count']}]
+                    for key, state in self._values.items()]
+
+
+class Registry:
+    """ The metrics of a process. """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._written = 0.0
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already exists.")
+            self._metrics[metric.name] = metric
+        metric._registry = self
+
+    def snapshot(self):
+        """ Return the metrics of this process as JSON-friendly data. """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {'kind': metric.kind,
+                              'help': metric.documentation,
+                              'labels': list(metric.labelnames),
+                              'buckets': list(getattr(metric, 'buckets', [])),
+                              'samples': metric.samples()}
+                for metric in metrics}
+
+    def changed(self):
+        """
+        Write the snapshot file of this process, at most once every
+        settings.METRICS_WRITE_INTERVAL seconds.
+        """
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if now - self._written < settings.METRICS_WRITE_INTERVAL:
+            return
+        self._written = now
+        self.write()
+
+    def write(self):
+        """ Write the snapshot file of this process to METRICS_DIR. """
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        descriptor, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(path, os.path.join(directory, _snapshot_name()))
+
+    def collect(self):
+        """
+        Return the snapshot of this process, or of all the processes
+        that write to METRICS_DIR added up.
+        """
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.write()
+        with _directory_lock(directory) as locked:
+            snapshots = _read_snapshots(directory)
+            if locked:
+                _retire(directory, snapshots)
+        merged = {}
+        for pid, _, snapshot in snapshots:
+            _merge(merged, snapshot, pid, pid is not None and _running(pid))
+        return merged
+
+
+RETIRED = 'retired.json'
+
+_process = None
+
+
+def _snapshot_name():
+    """
+    Return the name of the snapshot file of this process, which stays
+    unique when the pid is reused by a later process.
+    """
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, f'{pid}-{time.time_ns()}.json')
+    return _process[1]
+
+
+@contextmanager
+def _directory_lock(directory):
+    """ Hold the lock of METRICS_DIR in the block, if it can be locked. """
+    if fcntl is None:
+        yield False
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_snapshots(directory):
+    """
+    Return the snapshot files of METRICS_DIR as (pid, filename,
+    snapshot), with no pid for the retired snapshot.
+    """
+    snapshots = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        pid = None
+        if filename != RETIRED:
+            pid = int(filename.split('-')[0].split('.')[0])
+        try:
+            with open(os.path.join(directory, filename)) as snapshot_file:
+                snapshots.append((pid, filename, json.load(snapshot_file)))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _retire(directory, snapshots):
+    """
+    Fold the snapshots of exited processes into the retired snapshot
+    and delete their files. snapshots is changed in place to match.
+    """
+    exited = {filename for pid, filename, _ in snapshots
+              if pid is not None and not _running(pid)}
+    if not exited:
+        return
+    retired = {}
+    for pid, filename, snapshot in snapshots:
+        if pid is None or filename in exited:
+            _merge(retired, snapshot, pid, False)
+    descriptor, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as snapshot_file:
+        json.dump(retired, snapshot_file)
+    os.replace(path, os.path.join(directory, RETIRED))
+    for filename in exited:
+        os.remove(os.path.join(directory, filename))
+    snapshots[:] = [entry for entry in snapshots
+                    if entry[0] is not None and entry[1] not in exited]
+    snapshots.append((None, RETIRED, retired))
+
+
+def _running(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(merged, snapshot, pid, running):
+    for name, metric in snapshot.items():
+        target = merged.setdefault(name, dict(metric, samples=[]))
+        samples = {tuple(key): value for key, value in target['samples']}
+        if metric['kind'] == 'gauge':
+            if not running:
+                continue
+            if 'pid' not in target['labels']:
+                target['labels'] = target['labels'] + ['pid']
+            for key, value in metric['samples']:
+                samples[tuple(key) + (str(pid),)] = value
+        else:
+            for key, value in metric['samples']:
+                key = tuple(key)
+                if metric['kind'] == 'counter':
+                    samples[key] = samples.get(key, 0) + value
+                    continue
+                state = samples.setdefault(key, {
+                    'buckets': [0] * len(value['buckets']), 'sum': 0.0,
+                    'count': 0})
+                state['buckets'] = [a + b for a, b in zip(state['buckets'],
+                                                          value['buckets'])]
+                state['sum'] += value['sum']
+                state['count'] += value['count']
+        target['samples'] = [[list(key), value]
+                             for key, value in samples.items()]
+
+
+def _escape(value):
+    return (value.replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def exposition(snapshot):
+    """ Return a snapshot in the Prometheus text exposition format. """
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key, value in sorted(metric['samples']):
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(metric['labels'], key)} "
+                             f"{_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'], value['buckets']):
+                cumulative += count
+                le = _labels(metric['labels'], key, [('le', _number(bound))])
+                lines.append(f"{name}_bucket{le} {_number(cumulative)}")
+            le = _labels(metric['labels'], key, [('le', '+Inf')])
+            lines.append(f"{name}_bucket{le} {_number(value['count'])}")
+            labels = _labels(metric['labels'], key)
+            lines.append(f"{name}_sum{labels} {_number(value['sum'])}")
+            lines.append(f"{name}_count{labels} {_number(value['count'])}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.write)
@@ -0,0 +1,95 @@
+"""
+Database routing between the primary database and its read replicas.
+
+Reads go to a random alias of settings.DATABASE_REPLICAS, writes go to
+the primary. Reads stay on the primary inside a transaction, and while
+the request is pinned to it by PrimaryPinMiddleware: during a request
+that may write and for DATABASE_PIN_SECONDS after it, so users read
+their own votes before the replicas catch up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+
+@contextmanager
+def pin_to_primary():
+    """ Read from the primary database within the block. """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    """ Send reads to the replicas and writes to the primary. """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or _pinned.get()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """ Replicas get their schema from the primary. """
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin requests that may write to the primary database, and the
+    requests of the same browser for DATABASE_PIN_SECONDS after them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pinned.set(self.pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self.pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.process_response(request, response)
+
+    def pinned(self, request):
+        return (request.method not in SAFE_METHODS
+                or PIN_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.DATABASE_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,191 @@
+"""
+SQL and template timing of every request.
+
+QueryTimingMiddleware counts the queries of a request and measures how
+long they and the template rendering took. It sends them back in a
+Server-Timing header, which browsers show in their developer tools, and
+adds them to per-view totals of the process, read with timing_stats().
+The request durations also go to a histogram served on /metrics.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connections
+from django.template.backends import django as django_backend
+
+from .metrics import Histogram
+
+_current = ContextVar('request_timing', default=None)
+_stats = {}
+_stats_lock = threading.Lock()
+
+REQUEST_DURATION = Histogram(
+    'polls_request_duration_seconds', "Seconds to serve a request, by view.",
+    ['view'])
+
+
+class RequestTiming:
+    """
+    The timing of one request, and the execute wrapper that measures its
+    queries.
+
+    Attributes:
+        queries (int) : Number of SQL queries.
+        db_time (float) : Seconds spent in the database.
+        render_time (float) : Seconds spent rendering templates.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.start = time.perf_counter()
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def install(self):
+        """ Measure the queries on the connections of this thread. """
+        self._connections = connections.all()
+        for connection in self._connections:
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        for connection in self._connections:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self._connections = []
+
+    def finish(self, view_name):
+        """
+        Add the timing to the totals of a view.
+
+        Return :
+            str: the Server-Timing header of the request.
+        """
+        total = time.perf_counter() - self.start
+        with _stats_lock:
+            stats = _stats.setdefault(view_name, {
+                'requests': 0, 'queries': 0, 'max_queries': 0,
+                'db_time': 0.0, 'render_time': 0.0, 'total_time': 0.0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += self.queries
+            stats['max_queries'] = max(stats['max_queries'], self.queries)
+            stats['db_time'] += self.db_time
+            stats['render_time'] += self.render_time
+            stats['total_time'] += total
+        REQUEST_DURATION.observe(total, view=view_name)
+        return (f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{self.queries} queries", '
+                f'render;dur={self.render_time * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}')
+
+
+def timing_stats():
+    """
+    Return the totals of the requests served by this process.
+
+    Return :
+        dict: for each URL name, the number of requests and queries, the
+        most queries of one request and the seconds spent in the
+        database, rendering templates and in total.
+    """
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def reset_timing_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class QueryTimingMiddleware:
+    """
+    Measure the queries and the template rendering of each request.
+
+    Async requests run their queries in a thread, so the timing is
+    installed on that thread's connections instead of the event loop's.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        timing.install()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.uninstall()
+            _current.reset(token)
+        return self.add_timing(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        await sync_to_async(timing.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(timing.uninstall)()
+            _current.reset(token)
+        return self.add_timing(request, response, timing)
+
+    def add_timing(self, request, response, timing):
+        header = timing.finish(_view_name(request))
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = header
+        return response
+
+
+class Template:
+    """ A Django template that adds its render time to the request's. """
+
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timing = _current.get()
+            if timing is not None:
+                timing.render_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """ The Django template backend, timed by QueryTimingMiddleware. """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name))
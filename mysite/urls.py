@@ -9,4 +9,5 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
     path('signup/', views.signup, name='signup'),
     path('admin/', admin.site.urls),
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,27 +1,40 @@
+from django.http import HttpResponse
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth import login
 
 from django.contrib import messages
 
+from .forms import SignupForm
+from .hashing import HashingBusy
+from .metrics import REGISTRY, exposition
+
 
 def signup(request):
     """Register a new user."""
     if request.method == 'POST':
-        form = UserCreationForm(request.POST)
+        form = SignupForm(request.POST)
         if form.is_valid():
-            form.save()
-            # get named fields from the form data
-            username = form.cleaned_data.get('username')
-            # password input field is named 'password1'
-            raw_passwd = form.cleaned_data.get('password1')
-            user = authenticate(username=username, password=raw_passwd)
-            login(request, user)
+            try:
+                user = form.save()
+            except HashingBusy:
+                messages.error(request, "Sign up is busy, please try again.")
+                return render(request, 'registration/signup.html',
+                              {'form': form}, status=503)
+            # the password has just been checked by the form, so log in
+            # without hashing it again in authenticate()
+            login(request, user,
+                  backend='django.contrib.auth.backends.ModelBackend')
             messages.success(request, "Sign up is successful.")
             return redirect('polls:index')
         else:
             messages.error(request, "Sign up is unsuccessful.")
     else:
         # create a user form and display it the signup page
-        form = UserCreationForm()
+        form = SignupForm()
     return render(request, 'registration/signup.html', {'form': form})
+
+
+def metrics(request):
+    """Serve the metrics of all workers in the Prometheus text format."""
+    return HttpResponse(exposition(REGISTRY.collect()),
+                        content_type='text/plain; version=0.0.4')
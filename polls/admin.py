@@ -1,6 +1,11 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.utils import timezone
 
-from .models import Choice, Question
+from .counters import reconcile, reset
+from .exports import VoteExporter, export, export_response, vote_rows
+from .models import Choice, Question, Vote
+from .snapshots import forget_frozen_results
 
 
 class ChoiceInline(admin.TabularInline):
@@ -8,16 +13,178 @@ class ChoiceInline(admin.TabularInline):
     extra = 3
 
 
+class VotingStatusFilter(admin.SimpleListFilter):
+    title = 'voting status'
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        return [('open', 'Open'), ('closed', 'Closed')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'open':
+            return queryset.open()
+        if self.value() == 'closed':
+            return queryset.closed()
+        return queryset
+
+
+class VotesFilter(admin.SimpleListFilter):
+    """ Filter by an annotated vote count, named by count_field. """
+    title = 'votes'
+    parameter_name = 'votes'
+    count_field = None
+
+    def lookups(self, request, model_admin):
+        return [('none', 'No votes'), ('some', 'Some votes')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'none':
+            return queryset.filter(**{self.count_field: 0})
+        if self.value() == 'some':
+            return queryset.filter(**{f'{self.count_field}__gt': 0})
+        return queryset
+
+
+class QuestionVotesFilter(VotesFilter):
+    count_field = 'vote_total'
+
+
+class ChoiceVotesFilter(VotesFilter):
+    count_field = 'tally'
+
+
+class ChoiceCountFilter(admin.SimpleListFilter):
+    title = 'choices'
+    parameter_name = 'choices'
+
+    def lookups(self, request, model_admin):
+        return [('none', 'No choices'), ('some', 'Some choices')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'none':
+            return queryset.filter(choice_count=0)
+        if self.value() == 'some':
+            return queryset.filter(choice_count__gt=0)
+        return queryset
+
+
 class QuestionAdmin(admin.ModelAdmin):
     fieldsets = [
         (None,               {'fields': ['question_text']}),
         ('Date information', {'fields': ['pub_date', 'end_date'],
+                              'classes': ['collapse']}),
+        ('Vote counting',    {'fields': ['counter_shards'],
                               'classes': ['collapse']}), ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'end_date', 'can_vote')
-    list_filter = ['pub_date', 'end_date']
+    list_display = ('question_text', 'pub_date', 'end_date', 'can_vote',
+                    'choice_count', 'vote_total')
+    list_filter = [VotingStatusFilter, QuestionVotesFilter, ChoiceCountFilter,
+                   'pub_date', 'end_date']
     search_fields = ['question_text']
+    actions = ['close_now', 'reopen', 'reset_votes', 'recompute_totals']
+
+    def get_queryset(self, request):
+        """
+        Annotate the voting status, the number of choices and the total
+        votes, so the changelist can sort and filter by them.
+        """
+        return super().get_queryset(request).with_status().with_counts()
+
+    @admin.display(description='Choices', ordering='choice_count')
+    def choice_count(self, question):
+        return question.choice_count
+
+    @admin.display(description='Votes', ordering='vote_total')
+    def vote_total(self, question):
+        return question.vote_total
+
+    @staticmethod
+    def _selected(queryset):
+        """
+        Return the questions of an action's selection without the
+        changelist annotations, to be updated with a single statement.
+        """
+        return Question.objects.filter(pk__in=queryset.values('pk'))
+
+    @admin.action(description='Close voting on selected questions now')
+    def close_now(self, request, queryset):
+        now = timezone.now()
+        closed = self._selected(queryset).filter(
+            Q(end_date__isnull=True) | Q(end_date__gt=now)).update(
+            end_date=now)
+        self.message_user(request, f"Closed {closed} questions.")
+
+    @admin.action(description='Reopen voting on selected questions')
+    def reopen(self, request, queryset):
+        question_ids = list(self._selected(queryset)
+                            .filter(end_date__lte=timezone.now())
+                            .values_list('pk', flat=True))
+        reopened = Question.objects.filter(pk__in=question_ids).update(
+            end_date=None)
+        forget_frozen_results(*question_ids)
+        self.message_user(request, f"Reopened {reopened} questions.")
+
+    @admin.action(description='Delete the votes of selected questions')
+    def reset_votes(self, request, queryset):
+        deleted = reset(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"Deleted {deleted} votes.")
+
+    @admin.action(description='Recompute the vote totals of selected '
+                              'questions')
+    def recompute_totals(self, request, queryset):
+        repaired = reconcile(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"Repaired {repaired} counters.")
+
+
+class ChoiceAdmin(admin.ModelAdmin):
+    list_display = ('choice_text', 'question', 'tally')
+    list_select_related = ('question',)
+    list_filter = [ChoiceVotesFilter]
+    search_fields = ['choice_text', 'question__question_text']
+
+    def get_queryset(self, request):
+        """
+        Annotate the votes of each choice, counter shards included, so
+        the changelist can sort and filter by them.
+        """
+        return super().get_queryset(request).with_tally()
+
+    @admin.display(description='Votes', ordering='tally')
+    def tally(self, choice):
+        return choice.tally
+
+
+class VoteAdmin(admin.ModelAdmin):
+    """
+    Read-only list of the votes. Votes are only written by
+    Vote.objects.record(), which keeps the counters and caches in step,
+    so they cannot be added, changed or deleted here.
+    """
+    list_display = ('user', 'question', 'choice', 'voted_at')
+    list_select_related = ('user', 'question', 'choice')
+    list_filter = ['voted_at']
+    raw_id_fields = ('user', 'question', 'choice')
+    actions = ['export_csv']
+
+    @admin.action(description='Export selected votes as CSV')
+    def export_csv(self, request, queryset):
+        """
+        Stream the selected votes as a CSV file.
+        """
+        exporter = VoteExporter('csv')
+        return export_response(export(vote_rows(queryset=queryset), exporter),
+                               exporter, 'votes')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(Question, QuestionAdmin)
-admin.site.register(Choice)
+admin.site.register(Choice, ChoiceAdmin)
+admin.site.register(Vote, VoteAdmin)
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import async_views
+
+app_name = 'polls'
+urlpatterns = [
+    path('', async_views.IndexView.as_view(), name='index'),
+    path('<int:pk>/', async_views.DetailView.as_view(), name='detail'),
+    path('<int:pk>/results/', async_views.ResultsView.as_view(),
+         name='results'),
+    path('<int:pk>/results/stream/', async_views.results_stream,
+         name='results_stream'),
+    path('<int:question_id>/vote/', async_views.vote, name='vote'),
+    path('export/', async_views.export_votes, name='export'),
+    path('<int:pk>/export/', async_views.export_votes,
+         name='export_question'), ]
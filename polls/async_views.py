@@ -0,0 +1,213 @@
+"""
+Native async versions of the polls views, served by mysite.asgi_urls.
+
+They read the database with the async ORM, so an ASGI server can keep
+many requests waiting on it without a thread for each request. Writes
+still run in a thread, because transactions are not async in Django.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.db import OperationalError
+from django.http import (Http404, HttpResponseBadRequest, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.views import View
+
+from mysite.db import is_locked, retry_on_locked
+
+from .buffer import get_vote_buffer
+from .cache import (abump_results_version, aforget_vote_maps, aget_results,
+                    aquestion_choices, aremember_vote, avote_map, find_choice)
+from .exports import aexport, export_options, export_response, vote_rows
+from .metrics import VOTES_ACCEPTED, VOTES_REJECTED
+from .models import Question, Vote
+from .fragments import aindex_fragment, question_table
+from .snapshots import (acached_frozen_results, frozen_response,
+                        frozen_results, is_final)
+from .streams import stream_results
+
+
+async def load_user(request):
+    """
+    Load the user of the request in a thread, so the templates can use
+    request.user without querying the database from the event loop.
+    """
+    request.user = await sync_to_async(get_user)(request)
+    return request.user
+
+
+class IndexView(View):
+    template_name = 'polls/index.html'
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request for the poll index page.
+        """
+        fragment = await aindex_fragment(request.GET.get('cursor'))
+        this_user = await load_user(request)
+        votes = None
+        if this_user.is_authenticated:
+            votes = await avote_map(this_user.pk)
+        return render(request, self.template_name,
+                      {"latest_question_list": fragment['page'].items,
+                       "page": fragment['page'],
+                       "question_table": question_table(fragment, votes)})
+
+
+class DetailView(View):
+    template_name = 'polls/detail.html'
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request for the poll detail page.
+        It will be redirected to the poll index page only if
+        the poll question does not exist or voting is not allowed.
+        """
+        try:
+            question = await Question.objects.aget(pk=kwargs['pk'])
+        except Question.DoesNotExist:
+            messages.error(request, f"Poll question {kwargs['pk']}"
+                                    f" does not exist.")
+            return redirect("polls:index")
+
+        if not question.can_vote():
+            messages.error(request, f"Poll question {kwargs['pk']}"
+                                    f" does not allow voting.")
+            return redirect("polls:index")
+
+        this_user = await load_user(request)
+        voted_choice_id = None
+        if this_user.is_authenticated:
+            voted_choice_id = (await avote_map(this_user.pk)).get(question.id)
+        return render(request, self.template_name,
+                      {"question": question,
+                       "choices": await aquestion_choices(question.id),
+                       "voted_choice_id": voted_choice_id})
+
+
+class ResultsView(View):
+    template_name = 'polls/results.html'
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request for the poll result page.
+        It will be redirected to the poll index page only if
+        the poll question does not exist or has not been opened yet.
+        Closed polls are served from their frozen results.
+        """
+        frozen = await acached_frozen_results(kwargs['pk'])
+        if frozen is None:
+            try:
+                question = await Question.objects.aget(pk=kwargs['pk'])
+            except Question.DoesNotExist:
+                messages.error(request, f"Poll question {kwargs['pk']}"
+                                        f" does not exist.")
+                return redirect("polls:index")
+
+            if not question.is_published():
+                messages.error(request, f"Poll question {kwargs['pk']}"
+                                        f" has not been opened yet.")
+                return redirect("polls:index")
+            if is_final(question):
+                frozen = await sync_to_async(frozen_results)(question)
+        if frozen is not None:
+            await load_user(request)
+            return frozen_response(request, self.template_name, frozen)
+
+        results = await aget_results(question.id)
+        await load_user(request)
+        return render(request, self.template_name,
+                      {"question": question,
+                       "results": results,
+                       "stream": True})
+
+
+async def results_stream(request, pk):
+    """
+    Stream the results of a published poll question as Server-Sent
+    Events.
+    """
+    if not await Question.objects.published().filter(pk=pk).aexists():
+        raise Http404("No Question matches the given query.")
+    response = StreamingHttpResponse(stream_results(pk),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def vote(request, question_id):
+    """
+    Handles user voting for a specific poll question.
+    """
+    this_user = await load_user(request)
+    if not this_user.is_authenticated:
+        VOTES_REJECTED.inc(reason='unauthenticated')
+        return redirect_to_login(request.get_full_path())
+
+    try:
+        question = await Question.objects.aget(pk=question_id)
+    except Question.DoesNotExist:
+        VOTES_REJECTED.inc(reason='missing_question')
+        raise Http404("No Question matches the given query.")
+
+    if not question.can_vote():
+        VOTES_REJECTED.inc(reason='closed_poll')
+        messages.error(request, f"Poll question {question_id}"
+                                f" does not allow voting.")
+        return redirect("polls:index")
+
+    selected_choice = find_choice(question, request.POST.get('choice'),
+                                  await aquestion_choices(question.id))
+    if selected_choice is None:
+        VOTES_REJECTED.inc(reason='missing_choice')
+        messages.error(request, "Please select choice")
+        return redirect("polls:detail", pk=question_id)
+
+    if settings.POLLS_VOTE_BUFFER:
+        await sync_to_async(get_vote_buffer().append)(
+            this_user.pk, question.id, selected_choice.id)
+        await aremember_vote(this_user.pk, question.id, selected_choice.id)
+    else:
+        try:
+            await sync_to_async(retry_on_locked)(
+                Vote.objects.record, this_user, selected_choice)
+        except OperationalError as error:
+            if not is_locked(error):
+                raise
+            VOTES_REJECTED.inc(reason='database_locked')
+            messages.error(request, "The poll is busy, please vote again.")
+            return redirect("polls:detail", pk=question_id)
+        await abump_results_version(question.id)
+        await aforget_vote_maps(this_user.pk)
+    VOTES_ACCEPTED.inc()
+    messages.success(request,
+                     f"Your choice ( {selected_choice} ) has been saved.")
+
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+
+
+async def export_votes(request, pk=None):
+    """
+    Stream the votes of all questions, or of question pk, as a CSV or
+    JSON Lines file. The query parameters format, gzip, since and until
+    choose the format and the date range.
+    """
+    this_user = await load_user(request)
+    if not (this_user.is_active and this_user.is_staff):
+        return redirect_to_login(request.get_full_path(),
+                                 reverse('admin:login'))
+    try:
+        filters, exporter = export_options(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if pk is not None and not await Question.objects.filter(pk=pk).aexists():
+        raise Http404("No Question matches the given query.")
+    name = f"votes-{pk}" if pk is not None else "votes"
+    return export_response(
+        aexport(vote_rows(question_id=pk, **filters), exporter),
+        exporter, name)
@@ -0,0 +1,109 @@
+"""Write-behind buffer that stages accepted votes in a local SQLite file."""
+import sqlite3
+import threading
+
+from django.conf import settings
+
+from mysite.db import retry_on_locked
+
+from .cache import bump_results_version, forget_vote_maps
+from .metrics import VOTE_BUFFER_DEPTH
+from .models import Vote
+
+
+class VoteBuffer:
+    """
+    Durable queue of votes waiting to be written to the database.
+
+    Votes are appended to a table in a separate SQLite file in WAL mode,
+    so accepting a vote never waits for the write lock of the main
+    database. Every thread uses its own connection to the file.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pending_vote ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " user_id INTEGER NOT NULL,"
+                " question_id INTEGER NOT NULL,"
+                " choice_id INTEGER NOT NULL)")
+            self._local.connection = connection
+        return connection
+
+    def append(self, user_id, question_id, choice_id):
+        """ Add a vote to the end of the queue. """
+        self._connection().execute(
+            "INSERT INTO pending_vote (user_id, question_id, choice_id)"
+            " VALUES (?, ?, ?)", (user_id, question_id, choice_id))
+
+    def peek(self, limit):
+        """
+        Return the oldest votes of the queue without removing them.
+
+        Return :
+            list: (seq, user_id, question_id, choice_id) tuples in the
+            order the votes were accepted.
+        """
+        return self._connection().execute(
+            "SELECT seq, user_id, question_id, choice_id FROM pending_vote"
+            " ORDER BY seq LIMIT ?", (limit,)).fetchall()
+
+    def discard_through(self, seq):
+        """ Remove every vote up to and including seq from the queue. """
+        self._connection().execute(
+            "DELETE FROM pending_vote WHERE seq <= ?", (seq,))
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM pending_vote").fetchone()[0]
+
+    def flush(self, batch_size):
+        """
+        Write the oldest batch of votes to the database.
+
+        Only the last vote of each user for a question is kept, and the
+        batch is removed from the queue once it has been committed.
+        Writing a batch twice gives the same result, so a flush that dies
+        before the batch is removed loses nothing. The cached votes of the
+        voters are dropped, as a page may have cached them without the
+        votes of the batch.
+
+        Return :
+            int: number of votes taken from the queue.
+        """
+        pending = self.peek(batch_size)
+        if not pending:
+            return 0
+        latest = {}
+        for _, user_id, question_id, choice_id in pending:
+            latest[user_id, question_id] = choice_id
+        retry_on_locked(Vote.objects.record_many, latest)
+        self.discard_through(pending[-1][0])
+        VOTE_BUFFER_DEPTH.set(len(self))
+        for question_id in {question_id for _, question_id in latest}:
+            bump_results_version(question_id)
+        forget_vote_maps(*{user_id for user_id, _ in latest})
+        return len(pending)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """ Return the vote buffer at settings.POLLS_VOTE_BUFFER_PATH. """
+    path = str(settings.POLLS_VOTE_BUFFER_PATH)
+    with _buffers_lock:
+        if path not in _buffers:
+            _buffers[path] = VoteBuffer(path)
+        return _buffers[path]
@@ -0,0 +1,287 @@
+"""
+Cached poll results, invalidated by a version key per question, the
+version of the list of questions, the votes of each user and the
+choices of each question.
+
+The caches are filled from the primary database. Filled from a replica
+that has not caught up with an edit yet, they would keep the old data
+under the new version until the next edit.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum, Window
+from django.db.models.functions import Coalesce, NullIf
+
+from mysite.routers import pin_to_primary
+
+from .metrics import count_results_lookup
+from .models import Choice, Vote
+
+
+def _results_version_key(question_id):
+    return f'polls:results-version:{question_id}'
+
+
+POLL_LIST_VERSION_KEY = 'polls:list-version'
+
+
+def _version(key):
+    """
+    Return the current version of a version key.
+
+    A missing version starts from the current time in milliseconds, so
+    data cached under an evicted version is never read again.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1_000_000, None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1_000_000, None)
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns() // 1_000_000, None)
+        version = await cache.aget(key)
+    return version
+
+
+async def _abump(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, time.time_ns() // 1_000_000, None)
+
+
+def results_version(question_id):
+    """ Return the current results version of a question. """
+    return _version(_results_version_key(question_id))
+
+
+def bump_results_version(question_id):
+    """ Invalidate the cached results of a question. """
+    _bump(_results_version_key(question_id))
+
+
+async def aresults_version(question_id):
+    """ Async version of results_version(). """
+    return await _aversion(_results_version_key(question_id))
+
+
+async def abump_results_version(question_id):
+    """ Async version of bump_results_version(). """
+    await _abump(_results_version_key(question_id))
+
+
+def poll_list_version():
+    """ Return the version of the list of published questions. """
+    return _version(POLL_LIST_VERSION_KEY)
+
+
+def bump_poll_list_version():
+    """ Invalidate the cached fragments of the list of questions. """
+    _bump(POLL_LIST_VERSION_KEY)
+
+
+async def apoll_list_version():
+    """ Async version of poll_list_version(). """
+    return await _aversion(POLL_LIST_VERSION_KEY)
+
+
+def _results_queryset(question_id):
+    # Votes of counter shards that are not compacted yet count too.
+    total = Window(Sum('tally'))
+    return (Choice.objects.filter(question_id=question_id)
+            .with_tally()
+            .order_by('pk')
+            .annotate(total=total,
+                      percent=Coalesce(F('tally') * 100.0 / NullIf(total, 0),
+                                       0.0))
+            .values('id', 'choice_text', 'tally', 'total', 'percent'))
+
+
+def _results(choices):
+    for choice in choices:
+        choice['votes'] = choice.pop('tally')
+    return {'choices': choices,
+            'total': choices[0]['total'] if choices else 0}
+
+
+def compute_results(question_id):
+    """
+    Compute the results of a question in a single query.
+
+    Return :
+        dict: 'choices' holds the id, choice_text, votes and percent of
+        each choice, 'total' holds the number of votes of the question.
+    """
+    return _results(list(_results_queryset(question_id)))
+
+
+def get_results(question_id):
+    """ Return the results of a question from the cache if possible. """
+    key = f'polls:results:{question_id}:{results_version(question_id)}'
+    results = cache.get(key)
+    count_results_lookup(results is not None)
+    if results is None:
+        with pin_to_primary():
+            results = compute_results(question_id)
+        cache.set(key, results, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return results
+
+
+async def aget_results(question_id):
+    """ Async version of get_results(). """
+    version = await aresults_version(question_id)
+    key = f'polls:results:{question_id}:{version}'
+    results = await cache.aget(key)
+    count_results_lookup(results is not None)
+    if results is None:
+        with pin_to_primary():
+            results = _results([choice async for choice
+                                in _results_queryset(question_id)])
+        await cache.aset(key, results, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return results
+
+
+def _vote_map_key(user_id):
+    return f'polls:vote-map:{user_id}'
+
+
+def vote_map(user_id):
+    """
+    Return the votes of a user from the cache if possible, read in one
+    query otherwise.
+
+    Return :
+        dict: the id of the chosen choice for each question id.
+    """
+    key = _vote_map_key(user_id)
+    votes = cache.get(key)
+    if votes is None:
+        with pin_to_primary():
+            votes = dict(Vote.objects.filter(user_id=user_id)
+                         .values_list('question_id', 'choice_id'))
+        cache.set(key, votes, settings.POLLS_VOTE_MAP_CACHE_TIMEOUT)
+    return votes
+
+
+async def avote_map(user_id):
+    """ Async version of vote_map(). """
+    key = _vote_map_key(user_id)
+    votes = await cache.aget(key)
+    if votes is None:
+        with pin_to_primary():
+            votes = {question_id: choice_id
+                     async for question_id, choice_id
+                     in Vote.objects.filter(user_id=user_id)
+                     .values_list('question_id', 'choice_id')}
+        await cache.aset(key, votes, settings.POLLS_VOTE_MAP_CACHE_TIMEOUT)
+    return votes
+
+
+def forget_vote_maps(*user_ids):
+    """ Invalidate the cached votes of users after their votes changed. """
+    cache.delete_many([_vote_map_key(user_id) for user_id in user_ids])
+
+
+async def aforget_vote_maps(*user_ids):
+    """ Async version of forget_vote_maps(). """
+    await cache.adelete_many([_vote_map_key(user_id)
+                              for user_id in user_ids])
+
+
+def remember_vote(user_id, question_id, choice_id):
+    """
+    Add a vote to the cached votes of a user, for votes queued in the
+    vote buffer that the database does not have yet.
+    """
+    key = _vote_map_key(user_id)
+    votes = cache.get(key)
+    if votes is not None:
+        votes[question_id] = choice_id
+        cache.set(key, votes, settings.POLLS_VOTE_MAP_CACHE_TIMEOUT)
+
+
+async def aremember_vote(user_id, question_id, choice_id):
+    """ Async version of remember_vote(). """
+    key = _vote_map_key(user_id)
+    votes = await cache.aget(key)
+    if votes is not None:
+        votes[question_id] = choice_id
+        await cache.aset(key, votes, settings.POLLS_VOTE_MAP_CACHE_TIMEOUT)
+
+
+def _choices_key(question_id):
+    return f'polls:choices:{question_id}'
+
+
+def _choices_queryset(question_id):
+    return (Choice.objects.filter(question_id=question_id).order_by('pk')
+            .values('id', 'choice_text'))
+
+
+def question_choices(question_id):
+    """
+    Return the choices of a question from the cache if possible.
+
+    A question without choices is not cached, choices created later
+    with bulk_create() send no signal to invalidate it.
+
+    Return :
+        list: the id and choice_text of each choice, in display order.
+    """
+    key = _choices_key(question_id)
+    choices = cache.get(key)
+    if choices is None:
+        with pin_to_primary():
+            choices = list(_choices_queryset(question_id))
+        if choices:
+            cache.set(key, choices, settings.POLLS_CHOICES_CACHE_TIMEOUT)
+    return choices
+
+
+async def aquestion_choices(question_id):
+    """ Async version of question_choices(). """
+    key = _choices_key(question_id)
+    choices = await cache.aget(key)
+    if choices is None:
+        with pin_to_primary():
+            choices = [choice async for choice
+                       in _choices_queryset(question_id)]
+        if choices:
+            await cache.aset(key, choices,
+                             settings.POLLS_CHOICES_CACHE_TIMEOUT)
+    return choices
+
+
+def forget_question_choices(*question_ids):
+    """ Invalidate the cached choices of questions after an edit. """
+    cache.delete_many([_choices_key(question_id)
+                       for question_id in question_ids])
+
+
+def find_choice(question, choice_id, choices):
+    """
+    Return the Choice of question with id choice_id among its cached
+    choices, built without a query, or None if there is none.
+    """
+    try:
+        choice_id = int(choice_id)
+    except (TypeError, ValueError):
+        return None
+    for choice in choices:
+        if choice['id'] == choice_id:
+            return Choice(pk=choice_id, question=question,
+                          choice_text=choice['choice_text'])
+    return None
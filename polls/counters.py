@@ -0,0 +1,154 @@
+"""Rebuild the denormalized vote counters from the Vote table."""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .cache import bump_results_version, forget_vote_maps
+from .snapshots import forget_frozen_results
+from .models import (Choice, ChoiceCounterShard, Question, ResultSnapshot,
+                     Vote)
+
+
+def reconcile(question_ids):
+    """
+    Recompute Choice.votes and Question.total_votes of the given
+    questions from their Vote rows.
+
+    Every counter shard a vote for the questions can write to is created
+    if missing and locked, then the choices, before the votes are
+    counted. A vote committed while the counters are rebuilt then waits
+    for the locks and is neither lost nor counted twice. The shards are
+    decreased by the votes they had when locked, like in compact(), as
+    the choices count those votes now. The frozen results of repaired
+    questions are deleted, so closed polls are frozen again with the
+    repaired counts.
+
+    Return :
+        int: number of choices and questions whose counter was wrong.
+    """
+    question_ids = list(question_ids)
+    with transaction.atomic():
+        choice_ids = Choice.objects.filter(question_id__in=question_ids)
+        shard_counts = dict(Question.objects
+                            .filter(pk__in=question_ids, counter_shards__gt=1)
+                            .values_list('pk', 'counter_shards'))
+        ChoiceCounterShard.objects.bulk_create(
+            [ChoiceCounterShard(choice_id=choice_id, shard=shard)
+             for choice_id, question_id
+             in choice_ids.filter(question_id__in=list(shard_counts))
+             .values_list('pk', 'question_id')
+             for shard in range(shard_counts[question_id])],
+            ignore_conflicts=True)
+        shards = [(pk, choice_id, votes) for pk, choice_id, votes
+                  in ChoiceCounterShard.objects.select_for_update()
+                  .filter(choice__in=choice_ids.values('pk'))
+                  .values_list('pk', 'choice_id', 'votes')
+                  if votes]
+        shard_choice_ids = {choice_id for _, choice_id, _ in shards}
+        choices = list(Choice.objects.select_for_update()
+                       .filter(question_id__in=question_ids)
+                       .only('id', 'question_id', 'votes'))
+        counts = dict(Vote.objects.filter(question_id__in=question_ids)
+                      .values_list('choice')
+                      .annotate(n=Count('id'))
+                      .order_by())
+
+        totals = dict.fromkeys(question_ids, 0)
+        stale_choices = []
+        for choice in choices:
+            votes = counts.get(choice.pk, 0)
+            totals[choice.question_id] += votes
+            if choice.votes != votes or choice.pk in shard_choice_ids:
+                choice.votes = votes
+                stale_choices.append(choice)
+
+        stale_questions = []
+        for question in (Question.objects.select_for_update()
+                         .filter(pk__in=question_ids)
+                         .only('id', 'total_votes')):
+            if question.total_votes != totals[question.pk]:
+                question.total_votes = totals[question.pk]
+                stale_questions.append(question)
+
+        Choice.objects.bulk_update(stale_choices, ['votes'])
+        Question.objects.bulk_update(stale_questions, ['total_votes'])
+        ChoiceCounterShard.objects.bulk_update(
+            [ChoiceCounterShard(pk=pk, votes=F('votes') - votes)
+             for pk, _, votes in shards],
+            ['votes'])
+        repaired = ({choice.question_id for choice in stale_choices}
+                    | {question.pk for question in stale_questions})
+        ResultSnapshot.objects.filter(question_id__in=repaired).delete()
+
+    for question_id in repaired:
+        bump_results_version(question_id)
+    forget_frozen_results(*repaired)
+    return len(stale_choices) + len(stale_questions)
+
+
+def compact(question_ids=None):
+    """
+    Fold the counter shards of questions, all by default, into
+    Choice.votes and update Question.total_votes.
+
+    Every shard is decreased by the votes it had when read, instead of
+    set to zero, so votes added to it meanwhile are kept for the next
+    compaction.
+
+    Return :
+        int: number of questions with shards to fold.
+    """
+    shards = ChoiceCounterShard.objects.exclude(votes=0)
+    if question_ids is not None:
+        shards = shards.filter(choice__question_id__in=list(question_ids))
+    with transaction.atomic():
+        folded = list(shards.select_for_update()
+                      .values_list('pk', 'choice_id', 'choice__question_id',
+                                   'votes'))
+        choice_deltas = Counter()
+        question_deltas = Counter()
+        for _, choice_id, question_id, votes in folded:
+            choice_deltas[choice_id] += votes
+            question_deltas[question_id] += votes
+        ChoiceCounterShard.objects.bulk_update(
+            [ChoiceCounterShard(pk=pk, votes=F('votes') - votes)
+             for pk, _, _, votes in folded],
+            ['votes'])
+        Choice.objects.bulk_update(
+            [Choice(pk=pk, votes=F('votes') + delta)
+             for pk, delta in choice_deltas.items() if delta],
+            ['votes'])
+        Question.objects.bulk_update(
+            [Question(pk=pk, total_votes=F('total_votes') + delta)
+             for pk, delta in question_deltas.items() if delta],
+            ['total_votes'])
+    # The results count the shards too, so they stay the same and their
+    # cache is kept.
+    return len(question_deltas)
+
+
+def reset(question_ids):
+    """
+    Delete the votes of questions, with their counter shards and
+    frozen results, and set their counters to zero.
+
+    Return :
+        int: number of votes deleted.
+    """
+    question_ids = list(question_ids)
+    with transaction.atomic():
+        votes = Vote.objects.filter(question_id__in=question_ids)
+        user_ids = set(votes.values_list('user_id', flat=True))
+        deleted, _ = votes.delete()
+        ChoiceCounterShard.objects.filter(
+            choice__question_id__in=question_ids).delete()
+        ResultSnapshot.objects.filter(question_id__in=question_ids).delete()
+        Choice.objects.filter(question_id__in=question_ids).update(votes=0)
+        Question.objects.filter(pk__in=question_ids).update(total_votes=0)
+
+    for question_id in question_ids:
+        bump_results_version(question_id)
+    forget_frozen_results(*question_ids)
+    forget_vote_maps(*user_ids)
+    return deleted
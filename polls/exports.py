@@ -0,0 +1,180 @@
+"""
+Streaming export of votes as CSV or JSON Lines, optionally gzipped.
+
+Rows are read with a server-side iterator and turned into chunks of the
+export file as they arrive, so memory stays flat however many votes are
+exported.
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Vote
+
+FIELDS = ('vote_id', 'voted_at', 'user_id', 'username', 'question_id',
+          'question_text', 'choice_id', 'choice_text')
+_VALUES = ('pk', 'voted_at', 'user_id', 'user__username', 'question_id',
+           'question__question_text', 'choice_id', 'choice__choice_text')
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+
+
+def parse_when(value):
+    """
+    Parse a date or datetime of an export filter.
+
+    Raise :
+        ValueError: if value is neither.
+    """
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"{value!r} is not a date")
+        when = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def export_options(params):
+    """
+    Read the export options of a request's query parameters.
+
+    Return :
+        tuple: the keyword arguments of vote_rows() and a VoteExporter.
+
+    Raise :
+        ValueError: if an option is not valid.
+    """
+    filters = {}
+    if params.get('since'):
+        filters['since'] = parse_when(params['since'])
+    if params.get('until'):
+        filters['until'] = parse_when(params['until'])
+    compress = params.get('gzip', '') in ('1', 'true', 'yes')
+    return filters, VoteExporter(params.get('format', 'csv'), compress)
+
+
+def vote_rows(question_id=None, since=None, until=None, queryset=None):
+    """
+    Return the export rows of votes, oldest vote first.
+
+    Parameters :
+        question_id (int) : only votes of this question.
+        since (datetime) : only votes at or after this time.
+        until (datetime) : only votes before this time.
+        queryset (QuerySet) : votes to start from, all votes by default.
+    """
+    votes = Vote.objects.all() if queryset is None else queryset
+    if question_id is not None:
+        votes = votes.filter(question_id=question_id)
+    if since is not None:
+        votes = votes.filter(voted_at__gte=since)
+    if until is not None:
+        votes = votes.filter(voted_at__lt=until)
+    return votes.order_by('pk').values_list(*_VALUES)
+
+
+class VoteExporter:
+    """ Turns export rows into chunks of a CSV or JSON Lines file. """
+
+    def __init__(self, format='csv', compress=False):
+        if format not in FORMATS:
+            raise ValueError(f"unknown export format {format!r}")
+        self.format = format
+        self.compress = compress
+        self._text = io.StringIO()
+        self._csv = csv.writer(self._text)
+        self._gzip = zlib.compressobj(wbits=31) if compress else None
+
+    @property
+    def content_type(self):
+        return 'application/gzip' if self.compress else FORMATS[self.format]
+
+    def filename(self, name):
+        suffix = '.gz' if self.compress else ''
+        return f"{name}.{self.format}{suffix}"
+
+    def _encode(self, text):
+        data = text.encode()
+        if self._gzip is not None:
+            data = self._gzip.compress(data)
+        return data
+
+    def header(self):
+        if self.format == 'csv':
+            self._csv.writerow(FIELDS)
+            return self._take()
+        return b''
+
+    def rows(self, rows):
+        """ Return the bytes of a batch of rows. """
+        for row in rows:
+            if self.format == 'csv':
+                self._csv.writerow(row)
+            else:
+                self._text.write(json.dumps(dict(zip(FIELDS, row)),
+                                            cls=DjangoJSONEncoder))
+                self._text.write('\n')
+        return self._take()
+
+    def _take(self):
+        text = self._text.getvalue()
+        self._text.seek(0)
+        self._text.truncate()
+        return self._encode(text)
+
+    def finish(self):
+        return self._gzip.flush() if self._gzip is not None else b''
+
+
+def export(rows, exporter):
+    """ Yield the chunks of the export file of rows. """
+    batch = []
+    yield exporter.header()
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            yield exporter.rows(batch)
+            batch = []
+    yield exporter.rows(batch)
+    yield exporter.finish()
+
+
+async def aexport(rows, exporter):
+    """
+    Async version of export(), for the ASGI views.
+
+    Each chunk of rows is read in a thread. QuerySet.aiterator() cannot
+    be used, because it runs values_list() queries on the event loop in
+    Django 4.2.
+    """
+    iterator = rows.iterator(chunk_size=CHUNK_SIZE)
+    read_batch = sync_to_async(lambda: list(islice(iterator, CHUNK_SIZE)))
+    yield exporter.header()
+    while batch := await read_batch():
+        yield exporter.rows(batch)
+    yield exporter.finish()
+
+
+def export_response(chunks, exporter, name):
+    """ Return a response that streams the chunks as a file download. """
+    response = StreamingHttpResponse(chunks,
+                                     content_type=exporter.content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{exporter.filename(name)}"')
+    return response
@@ -0,0 +1,69 @@
+"""Incremental reading of fixture files that may not fit in memory."""
+import gzip
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+def open_fixture(path):
+    """ Open a fixture file as text, gzip files end with .gz. """
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_records(stream, chunk_size=1 << 16):
+    """
+    Yield the objects of a JSON array, as written by dumpdata, or of
+    JSON Lines, reading the stream a chunk at a time.
+
+    Raise :
+        ValueError: if the stream is not valid JSON.
+    """
+    buffer = stream.read(chunk_size)
+    start = len(buffer) - len(buffer.lstrip(_WHITESPACE))
+    if buffer[start:start + 1] != '[':
+        yield from _iter_lines(buffer, stream, chunk_size)
+        return
+
+    position = start + 1
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                break
+            more = stream.read(chunk_size)
+            if not more:
+                raise ValueError("Unexpected end of JSON array.")
+            buffer, position = more, 0
+
+        if buffer[position] == ']':
+            return
+        if buffer[position] == ',':
+            position += 1
+            continue
+        try:
+            record, position = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            more = stream.read(chunk_size)
+            if not more:
+                raise
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield record
+
+
+def _iter_lines(buffer, stream, chunk_size):
+    while True:
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+        more = stream.read(chunk_size)
+        if not more:
+            break
+        buffer += more
+    if buffer.strip():
+        yield json.loads(buffer)
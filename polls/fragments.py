@@ -0,0 +1,169 @@
+"""
+Cached fragments of pages, rebuilt by one worker at a time.
+
+A fragment is cached under a key that holds a version, so an edit makes
+every worker miss at the same moment. The first of them to take the
+rebuild lock renders the fragment, the others wait for it to appear in
+the cache instead of querying the database all at once. Fragments are
+built from the primary database, as a replica may not have the edit
+yet.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Subquery
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from mysite.routers import pin_to_primary
+
+from .cache import apoll_list_version, poll_list_version
+from .models import Question
+from .pagination import apaginate, decode_cursor, paginate
+
+_WAIT = 0.05
+
+
+def cached_fragment(key, build):
+    """
+    Return the cached value of key, or build and cache it.
+
+    Parameter :
+        build (callable) : returns the value and the seconds to cache it.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    timeout = settings.POLLS_FRAGMENT_LOCK_TIMEOUT
+    if not cache.add(lock_key, 1, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(_WAIT)
+            value = cache.get(key)
+            if value is not None:
+                return value
+    try:
+        with pin_to_primary():
+            value, seconds = build()
+        cache.set(key, value, seconds)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+async def acached_fragment(key, build):
+    """ Async version of cached_fragment(), build is a coroutine. """
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    timeout = settings.POLLS_FRAGMENT_LOCK_TIMEOUT
+    if not await cache.aadd(lock_key, 1, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_WAIT)
+            value = await cache.aget(key)
+            if value is not None:
+                return value
+    try:
+        with pin_to_primary():
+            value, seconds = await build()
+        await cache.aset(key, value, seconds)
+    finally:
+        await cache.adelete(lock_key)
+    return value
+
+
+def _index_key(version, cursor):
+    # A cursor that is not valid shows the first page, like no cursor.
+    if cursor and decode_cursor(cursor) is None:
+        cursor = None
+    return f'polls:index:{version}:{cursor or ""}'
+
+
+def _timeout(next_pub_date):
+    """
+    Seconds to cache the question list, which changes without an edit
+    when the next question is published.
+    """
+    seconds = settings.POLLS_INDEX_CACHE_TIMEOUT
+    if next_pub_date is not None:
+        until = (next_pub_date - timezone.now()).total_seconds()
+        seconds = max(1, min(seconds, int(until) + 1))
+    return seconds
+
+
+def _published():
+    """
+    Return the published questions, each annotated with the pub_date of
+    the next question to be published, so the page query tells how long
+    its fragment stays valid.
+    """
+    upcoming = (Question.objects.filter(pub_date__gt=timezone.now())
+                .order_by('pub_date').values('pub_date')[:1])
+    return Question.objects.published().annotate(
+        next_pub_date=Subquery(upcoming))
+
+
+def _render_table(page, votes=None):
+    context = {'latest_question_list': page.items, 'page': page}
+    if votes is not None:
+        context.update(badges=True, voted=votes)
+    return render_to_string('polls/question_table.html', context)
+
+
+def _render(page, next_pub_date):
+    return ({'page': page, 'html': _render_table(page)},
+            _timeout(next_pub_date))
+
+
+def question_table(fragment, votes=None):
+    """
+    Return the question table of an index fragment. Given the votes of
+    a user, the table is rendered again from the cached page, with the
+    voted badges of that user.
+    """
+    if votes is None:
+        return fragment['html']
+    return _render_table(fragment['page'], votes)
+
+
+def index_fragment(cursor):
+    """
+    Return the page of published questions at a cursor and its rendered
+    table, from the cache if possible.
+
+    Return :
+        dict: 'page' holds the KeysetPage and 'html' the question table.
+    """
+    def build():
+        page = paginate(_published(), cursor, settings.POLLS_INDEX_PAGE_SIZE)
+        if page.items:
+            next_pub_date = page.items[0].next_pub_date
+        else:
+            next_pub_date = (Question.objects
+                             .filter(pub_date__gt=timezone.now())
+                             .aggregate(next=Min('pub_date'))['next'])
+        return _render(page, next_pub_date)
+
+    return cached_fragment(_index_key(poll_list_version(), cursor), build)
+
+
+async def aindex_fragment(cursor):
+    """ Async version of index_fragment(). """
+    async def build():
+        page = await apaginate(_published(), cursor,
+                               settings.POLLS_INDEX_PAGE_SIZE)
+        if page.items:
+            next_pub_date = page.items[0].next_pub_date
+        else:
+            next_pub_date = (await Question.objects
+                             .filter(pub_date__gt=timezone.now())
+                             .aaggregate(next=Min('pub_date')))['next']
+        return _render(page, next_pub_date)
+
+    key = _index_key(await apoll_list_version(), cursor)
+    return await acached_fragment(key, build)
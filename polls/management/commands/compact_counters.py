@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polls.counters import compact
+
+
+class Command(BaseCommand):
+    help = ("Fold the counter shards of hot polls into the vote counters "
+            "of their choices and questions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=settings.POLLS_COUNTER_COMPACT_INTERVAL,
+                            help="Seconds between two compactions.")
+        parser.add_argument('--once', action='store_true',
+                            help="Compact once and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            compacted = compact()
+            if compacted and options['verbosity'] > 1:
+                self.stdout.write(
+                    f"Compacted the counters of {compacted} questions.")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
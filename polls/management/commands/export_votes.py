@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.exports import FORMATS, VoteExporter, export, parse_when, vote_rows
+
+
+class Command(BaseCommand):
+    help = ("Stream votes with their question, choice and user as CSV or "
+            "JSON Lines, without loading them all into memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--question', type=int,
+                            help="Only export the votes of this question.")
+        parser.add_argument('--format', choices=list(FORMATS),
+                            default='csv')
+        parser.add_argument('--gzip', action='store_true',
+                            help="Compress the output with gzip.")
+        parser.add_argument('--since', type=parse_when,
+                            help="Only votes at or after this date.")
+        parser.add_argument('--until', type=parse_when,
+                            help="Only votes before this date.")
+        parser.add_argument('-o', '--output',
+                            help="Output file, standard output by default.")
+
+    def handle(self, *args, **options):
+        exporter = VoteExporter(options['format'], options['gzip'])
+        rows = vote_rows(question_id=options['question'],
+                         since=options['since'], until=options['until'])
+        try:
+            output = (open(options['output'], 'wb') if options['output']
+                      else sys.stdout.buffer)
+        except OSError as error:
+            raise CommandError(f"Cannot write the export: {error}")
+        try:
+            for chunk in export(rows, exporter):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polls.buffer import get_vote_buffer
+
+
+class Command(BaseCommand):
+    help = ("Write the votes of the write-behind vote buffer to the "
+            "database in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.POLLS_VOTE_BUFFER_BATCH_SIZE,
+                            help="Number of buffered votes per transaction.")
+        parser.add_argument('--interval', type=float,
+                            default=settings.POLLS_VOTE_BUFFER_FLUSH_INTERVAL,
+                            help="Seconds to wait when the buffer is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit when the buffer is empty.")
+
+    def handle(self, *args, **options):
+        buffer = get_vote_buffer()
+        batch_size = options['batch_size']
+        while True:
+            flushed = total = buffer.flush(batch_size)
+            while flushed == batch_size:
+                flushed = buffer.flush(batch_size)
+                total += flushed
+            if total and options['verbosity'] > 1:
+                self.stdout.write(f"Flushed {total} votes.")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
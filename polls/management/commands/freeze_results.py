@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from polls.snapshots import final_questions, freeze
+
+
+class Command(BaseCommand):
+    help = "Freeze the results of the polls that have closed."
+
+    def handle(self, *args, **options):
+        frozen = 0
+        for question in final_questions().iterator():
+            freeze(question)
+            frozen += 1
+        if options['verbosity'] > 0:
+            self.stdout.write(f"Froze the results of {frozen} questions.")
@@ -0,0 +1,79 @@
+import csv
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from mysite.hashing import hash_passwords, hashing_pool
+from polls.fixtures import iter_records, open_fixture
+
+USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+class Command(BaseCommand):
+    help = ("Create user accounts from a CSV or JSON Lines file with "
+            "username and password columns, hashing the passwords across "
+            "a process pool.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('accounts',
+                            help="CSV, JSON or JSON Lines file of accounts.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Number of hashing processes.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of accounts per bulk insert.")
+
+    def handle(self, *args, **options):
+        created = skipped = 0
+        batch = []
+        try:
+            with hashing_pool(options['workers']) as pool:
+                for account in self.read_accounts(options['accounts']):
+                    batch.append(account)
+                    if len(batch) >= options['batch_size']:
+                        new = self.create_users(pool, batch)
+                        created += new
+                        skipped += len(batch) - new
+                        batch = []
+                if batch:
+                    new = self.create_users(pool, batch)
+                    created += new
+                    skipped += len(batch) - new
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Cannot provision users: {error}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} users, skipped {skipped} existing users."))
+
+    def read_accounts(self, path):
+        """ Yield a dict for each account of a CSV or JSON file. """
+        with open_fixture(path) as stream:
+            if str(path).removesuffix('.gz').endswith('.csv'):
+                yield from csv.DictReader(stream)
+            else:
+                yield from iter_records(stream)
+
+    def create_users(self, pool, accounts):
+        """
+        Hash the passwords of the new accounts in parallel and insert them
+        with one query. Accounts whose username is taken are skipped.
+
+        Return :
+            int: number of users created.
+        """
+        taken = set(User.objects.filter(
+            username__in=[account['username'] for account in accounts]
+        ).values_list('username', flat=True))
+        new_accounts = []
+        for account in accounts:
+            if account['username'] not in taken:
+                taken.add(account['username'])
+                new_accounts.append(account)
+
+        passwords = hash_passwords(pool, [account['password']
+                                          for account in new_accounts])
+        User.objects.bulk_create(
+            User(password=password,
+                 **{name: account.get(name) or '' for name in USER_FIELDS})
+            for account, password in zip(new_accounts, passwords))
+        return len(new_accounts)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from polls.counters import reconcile
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    help = ("Backfill or repair the vote counters of every question "
+            "from the Vote table, a chunk of questions at a time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Number of questions per transaction.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = repaired = 0
+        while True:
+            question_ids = list(Question.objects.filter(pk__gt=last_id)
+                                .order_by('pk')
+                                .values_list('pk', flat=True)[:chunk_size])
+            if not question_ids:
+                break
+            repaired += reconcile(question_ids)
+            checked += len(question_ids)
+            last_id = question_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} questions, repaired {repaired} counters."))
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.scheduler import next_run, run
+
+
+class Command(BaseCommand):
+    help = ("Warm the caches of polls about to open and freeze the results "
+            "of polls that closed, waking up at each opening and closing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=settings.POLLS_SCHEDULER_INTERVAL,
+                            help="Most seconds between two runs.")
+        parser.add_argument('--once', action='store_true',
+                            help="Run once and exit.")
+
+    def handle(self, *args, **options):
+        since = None
+        while True:
+            now = timezone.now()
+            done = run(now, since)
+            since = now
+            if options['verbosity'] > 1 or (options['once']
+                                            and options['verbosity'] > 0):
+                self.stdout.write(
+                    "Warmed {warmed}, compacted {compacted} and froze "
+                    "{frozen} questions.".format(**done))
+            if options['once']:
+                break
+            wait = options['interval']
+            upcoming = next_run()
+            if upcoming is not None:
+                wait = min(wait, (upcoming - timezone.now()).total_seconds())
+            time.sleep(max(wait, 0.1))
@@ -0,0 +1,42 @@
+"""Metrics of voting and of the results cache, served on /metrics."""
+import threading
+
+from mysite.metrics import Counter, Gauge, Histogram
+
+LOCK_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1,
+                2.5, 5)
+
+VOTES_ACCEPTED = Counter(
+    'polls_votes_accepted_total', "Votes saved or queued.")
+VOTES_REJECTED = Counter(
+    'polls_votes_rejected_total', "Votes refused, by reason.", ['reason'])
+VOTE_LOCK_WAIT = Histogram(
+    'polls_vote_lock_wait_seconds',
+    "Seconds a vote transaction waited to take its write lock.",
+    buckets=LOCK_BUCKETS)
+VOTE_LOCK_HELD = Histogram(
+    'polls_vote_lock_held_seconds',
+    "Seconds a vote transaction held its write lock.",
+    buckets=LOCK_BUCKETS)
+RESULTS_CACHE = Counter(
+    'polls_results_cache_requests_total',
+    "Lookups of cached results, by result hit or miss.", ['result'])
+RESULTS_CACHE_HIT_RATIO = Gauge(
+    'polls_results_cache_hit_ratio',
+    "Share of the results lookups of this process served by the cache.")
+VOTE_BUFFER_DEPTH = Gauge(
+    'polls_vote_buffer_depth',
+    "Votes left in the vote buffer after its last flush.")
+
+_lookups = {'hit': 0, 'miss': 0}
+_lookups_lock = threading.Lock()
+
+
+def count_results_lookup(hit):
+    """ Count a lookup of cached results and update the hit ratio. """
+    result = 'hit' if hit else 'miss'
+    RESULTS_CACHE.inc(result=result)
+    with _lookups_lock:
+        _lookups[result] += 1
+        ratio = _lookups['hit'] / (_lookups['hit'] + _lookups['miss'])
+    RESULTS_CACHE_HIT_RATIO.set(ratio)
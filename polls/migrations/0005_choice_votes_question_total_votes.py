@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("polls", "0004_remove_choice_votes_vote"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="choice",
+            name="votes",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="total_votes",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="total votes"
+            ),
+        ),
+    ]
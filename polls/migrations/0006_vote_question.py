@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:52
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_question_from_choice(apps, schema_editor):
+    """Fill Vote.question and keep only the latest vote per question."""
+    Choice = apps.get_model("polls", "Choice")
+    Vote = apps.get_model("polls", "Vote")
+    Vote.objects.update(
+        question=Subquery(
+            Choice.objects.filter(pk=OuterRef("choice")).values("question")[:1]
+        )
+    )
+    latest = (
+        Vote.objects.values("user", "question")
+        .annotate(latest_id=Max("id"))
+        .values("latest_id")
+    )
+    Vote.objects.exclude(pk__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("polls", "0005_choice_votes_question_total_votes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vote",
+            name="question",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="polls.question",
+            ),
+        ),
+        migrations.RunPython(copy_question_from_choice, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="vote",
+            name="question",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="polls.question"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="vote",
+            constraint=models.UniqueConstraint(
+                fields=("user", "question"), name="polls_vote_user_question_unique"
+            ),
+        ),
+    ]
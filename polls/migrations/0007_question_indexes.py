@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("polls", "0006_vote_question"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["-pub_date", "-id"], name="polls_question_pub_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["end_date", "pub_date"], name="polls_question_end_date_idx"
+            ),
+        ),
+    ]
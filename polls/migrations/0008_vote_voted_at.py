@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("polls", "0007_question_indexes"),
+    ]
+
+    operations = [
+        # Votes cast before this migration have no date, rather than the
+        # date of the migration.
+        migrations.AddField(
+            model_name="vote",
+            name="voted_at",
+            field=models.DateTimeField(null=True, verbose_name="date voted"),
+        ),
+        migrations.AlterField(
+            model_name="vote",
+            name="voted_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                null=True,
+                verbose_name="date voted",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vote",
+            index=models.Index(
+                fields=["question", "voted_at"], name="polls_vote_question_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:09
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("polls", "0008_vote_voted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="counter_shards",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text="Split the vote count of each choice over this many rows, so many voters at once do not wait for each other. 1 for no split.",
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(64),
+                ],
+                verbose_name="counter shards",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChoiceCounterShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("votes", models.IntegerField(default=0)),
+                (
+                    "choice",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="polls.choice",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="choicecountershard",
+            constraint=models.UniqueConstraint(
+                fields=("choice", "shard"), name="polls_choice_shard_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("polls", "0009_choicecountershard_question_counter_shards"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResultSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("votes", models.IntegerField()),
+                ("total", models.IntegerField()),
+                ("closed_at", models.DateTimeField()),
+                (
+                    "choice",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="polls.choice",
+                    ),
+                ),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="result_snapshots",
+                        to="polls.question",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="resultsnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("question", "choice"), name="polls_result_snapshot_unique"
+            ),
+        ),
+    ]
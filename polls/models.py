@@ -1,10 +1,89 @@
 import datetime
+import time
+from collections import Counter
 
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connection, models, transaction
+from django.db.models import (BooleanField, Count, ExpressionWrapper, F,
+                              OuterRef, Q, Subquery, Sum)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import admin
 from django.contrib.auth.models import User
 
+from .metrics import VOTE_LOCK_HELD, VOTE_LOCK_WAIT
+
+
+class QuestionQuerySet(models.QuerySet):
+    """
+    Filters and annotations for the state of questions, evaluated by the
+    database instead of row by row in Python.
+    """
+
+    @staticmethod
+    def _published_q(now):
+        return Q(pub_date__lte=now)
+
+    @staticmethod
+    def _open_q(now):
+        return Q(pub_date__lte=now) & (Q(end_date__isnull=True)
+                                       | Q(end_date__gte=now))
+
+    @staticmethod
+    def _recent_q(now):
+        return Q(pub_date__gte=now - datetime.timedelta(days=1),
+                 pub_date__lte=now)
+
+    def published(self):
+        """ Questions whose publication date has come. """
+        return self.filter(self._published_q(timezone.now()))
+
+    def open(self):
+        """ Questions that allow voting now, like Question.can_vote(). """
+        return self.filter(self._open_q(timezone.now()))
+
+    def closed(self):
+        """ Questions whose end date has passed. """
+        return self.filter(end_date__lt=timezone.now())
+
+    def recent(self):
+        """ Questions published within the last day. """
+        return self.filter(self._recent_q(timezone.now()))
+
+    def with_status(self):
+        """
+        Annotate each question with the booleans is_published_now,
+        voting_open and published_recently, so that they can be used to
+        filter and sort in SQL.
+        """
+        now = timezone.now()
+        return self.annotate(
+            is_published_now=ExpressionWrapper(
+                self._published_q(now), output_field=BooleanField()),
+            voting_open=ExpressionWrapper(
+                self._open_q(now), output_field=BooleanField()),
+            published_recently=ExpressionWrapper(
+                self._recent_q(now), output_field=BooleanField()),
+        )
+
+    def with_counts(self):
+        """
+        Annotate each question with choice_count, and with vote_total,
+        its total votes including those still in counter shards. Both
+        are subqueries, so they can be used to filter and sort in SQL
+        without multiplying rows.
+        """
+        choices = (Choice.objects.filter(question=OuterRef('pk'))
+                   .values('question').annotate(n=Count('pk')).values('n'))
+        shard_votes = (ChoiceCounterShard.objects
+                       .filter(choice__question=OuterRef('pk'))
+                       .values('choice__question')
+                       .annotate(votes=Sum('votes')).values('votes'))
+        return self.annotate(
+            choice_count=Coalesce(Subquery(choices), 0),
+            vote_total=F('total_votes') + Coalesce(Subquery(shard_votes), 0),
+        )
+
 
 class Question(models.Model):
     """
@@ -14,11 +93,33 @@ class Question(models.Model):
         question_text (str) : Field for text of the question.
         pub_date (datetime) : Field for the publication date.
         end_date (datetime) : Field for the end date of poll question.
+        total_votes (int) : Field for vote tally of all choices, kept up
+        to date by compaction for questions with counter shards.
+        counter_shards (int) : Field for the number of rows that share the
+        vote count of each choice.
     """
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published', default=timezone.now)
     end_date = models.DateTimeField('date ended', default=None, null=True,
                                     blank=True)
+    total_votes = models.IntegerField('total votes', default=0,
+                                      editable=False)
+    counter_shards = models.PositiveSmallIntegerField(
+        'counter shards', default=1,
+        validators=[MinValueValidator(1), MaxValueValidator(64)],
+        help_text="Split the vote count of each choice over this many "
+                  "rows, so many voters at once do not wait for each "
+                  "other. 1 for no split.")
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='polls_question_pub_date_idx'),
+            models.Index(fields=['end_date', 'pub_date'],
+                         name='polls_question_end_date_idx'),
+        ]
 
     def __str__(self):
         """ Return a text of the question. """
@@ -58,7 +159,7 @@ class Question(models.Model):
 
     @admin.display(
         boolean=True,
-        ordering='pub_date',
+        ordering='voting_open',
         description='Can vote?',
     )
     def can_vote(self):
@@ -75,6 +176,21 @@ class Question(models.Model):
         return self.pub_date <= now <= self.end_date
 
 
+class ChoiceQuerySet(models.QuerySet):
+    """ Annotations of choices evaluated by the database. """
+
+    def with_tally(self):
+        """
+        Annotate each choice with tally, its votes including those still
+        in its counter shards.
+        """
+        shard_votes = (ChoiceCounterShard.objects.filter(choice=OuterRef('pk'))
+                       .values('choice').annotate(votes=Sum('votes'))
+                       .values('votes'))
+        return self.annotate(
+            tally=F('votes') + Coalesce(Subquery(shard_votes), 0))
+
+
 class Choice(models.Model):
     """ Represents a choice in the poll question.
 
@@ -86,26 +202,267 @@ class Choice(models.Model):
     """
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    votes = models.IntegerField(default=0, editable=False)
 
-    @property
-    def votes(self):
-        """Count the votes for this choice."""
-        return self.vote_set.count()
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """ Return a text of the choice. """
         return self.choice_text
 
 
+class ChoiceCounterShard(models.Model):
+    """
+    Part of the vote tally of a Choice of a question with counter shards.
+    The tally of a choice is its votes plus the votes of its shards,
+    until compaction folds them back into the choice.
+
+    Attributes:
+        choice (Choice) : Foreign key to the choice counted.
+        shard (int) : Field for the number of the shard.
+        votes (int) : Field for the votes counted by the shard, which
+        may go below zero when votes move to another choice.
+    """
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'],
+                                    name='polls_choice_shard_unique'),
+        ]
+
+    @classmethod
+    def add(cls, choice_id, shard, delta):
+        """ Add delta to a shard, creating the shard row if needed. """
+        shards = cls.objects.filter(choice_id=choice_id, shard=shard)
+        if not shards.update(votes=F('votes') + delta):
+            cls.objects.bulk_create(
+                [cls(choice_id=choice_id, shard=shard)],
+                ignore_conflicts=True)
+            shards.update(votes=F('votes') + delta)
+
+
+class ResultSnapshot(models.Model):
+    """
+    The final vote count of a Choice, written once the results of its
+    question can no longer change.
+
+    Attributes:
+        question (Question) : Foreign key to the closed question.
+        choice (Choice) : Foreign key to the choice counted.
+        votes (int) : Field for the final votes of the choice.
+        total (int) : Field for the final votes of the question.
+        closed_at (datetime) : Field for the end date of the question
+        when the snapshot was taken.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE,
+                                 related_name='result_snapshots')
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               related_name='+')
+    votes = models.IntegerField()
+    total = models.IntegerField()
+    closed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'choice'],
+                                    name='polls_result_snapshot_unique'),
+        ]
+
+
+class _LockTimer:
+    """
+    Measure how long a vote transaction waits for its write lock and
+    then holds it. The wait lasts until locked() is called after the
+    first write, where SQLite takes its lock, and the hold lasts until
+    the transaction ends.
+    """
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.locked_at = None
+        return self
+
+    def locked(self):
+        self.locked_at = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.locked_at is not None:
+            VOTE_LOCK_WAIT.observe(self.locked_at - self.start)
+            VOTE_LOCK_HELD.observe(time.perf_counter() - self.locked_at)
+
+
+class VoteManager(models.Manager):
+    """ Manager that keeps vote counters in step with Vote rows. """
+
+    def record(self, user, choice):
+        """
+        Save the vote of a user for a choice. A user has only one vote
+        per question, so a previous vote for another choice of the same
+        question is replaced by this one.
+
+        The previous vote of the user is read with a row lock and
+        updated. A first vote is inserted with INSERT ... ON CONFLICT DO
+        NOTHING, and if a concurrent first vote of the same user wrote
+        the row in between, as on a double-click, that row is locked and
+        updated instead. The counters of Choice and Question follow what
+        the writes did, so each vote is counted once. For a question with
+        counter shards, the shard of the user is updated instead, which
+        leaves Question.total_votes to compaction.
+
+        Return :
+            Vote: the saved vote.
+        """
+        question_id = choice.question_id
+        vote = self.model(user=user, question_id=question_id, choice=choice)
+        votes = self.filter(user=user, question_id=question_id)
+        lock_timer = _LockTimer()
+        with lock_timer, transaction.atomic():
+            previous_choice_id = (votes.select_for_update()
+                                  .values_list('choice_id', flat=True)
+                                  .first())
+            if previous_choice_id is None and not self._insert(vote):
+                previous_choice_id = (votes.select_for_update()
+                                      .values_list('choice_id', flat=True)
+                                      .get())
+            if previous_choice_id == choice.pk:
+                return vote
+            if previous_choice_id is not None:
+                votes.update(choice=choice, voted_at=vote.voted_at)
+            lock_timer.locked()
+
+            shards = choice.question.counter_shards
+            if shards > 1:
+                shard = user.pk % shards
+                ChoiceCounterShard.add(choice.pk, shard, 1)
+                if previous_choice_id is not None:
+                    ChoiceCounterShard.add(previous_choice_id, shard, -1)
+                return vote
+
+            Choice.objects.filter(pk=choice.pk).update(votes=F('votes') + 1)
+            if previous_choice_id is None:
+                Question.objects.filter(pk=question_id).update(
+                    total_votes=F('total_votes') + 1)
+            else:
+                Choice.objects.filter(pk=previous_choice_id).update(
+                    votes=F('votes') - 1)
+        return vote
+
+    def _insert(self, vote):
+        """
+        Insert a vote unless the user already voted on its question.
+
+        Return :
+            bool: True if the vote was inserted.
+        """
+        meta = self.model._meta
+        quote = connection.ops.quote_name
+        fields = [meta.get_field(name)
+                  for name in ('question', 'choice', 'user', 'voted_at')]
+        sql = (f"INSERT INTO {quote(meta.db_table)} "
+               f"({', '.join(quote(field.column) for field in fields)}) "
+               f"VALUES ({', '.join(['%s'] * len(fields))}) "
+               f"ON CONFLICT ({quote(fields[2].column)}, "
+               f"{quote(fields[0].column)}) DO NOTHING")
+        params = [field.get_db_prep_save(getattr(vote, field.attname),
+                                         connection)
+                  for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount == 1
+
+    def record_many(self, votes):
+        """
+        Save a batch of votes with bulk queries in one transaction.
+        Votes for choices that no longer belong to their question are
+        dropped, and new or changed votes are dated now.
+
+        Parameter :
+            votes (dict) : choice id for each (user id, question id).
+        """
+        choice_questions = dict(Choice.objects.filter(pk__in=votes.values())
+                                .values_list('pk', 'question_id'))
+        votes = {key: choice_id for key, choice_id in votes.items()
+                 if choice_questions.get(choice_id) == key[1]}
+        if not votes:
+            return
+
+        now = timezone.now()
+        choice_deltas = Counter()
+        question_deltas = Counter()
+        new_votes = []
+        changed_votes = []
+        lock_timer = _LockTimer()
+        with lock_timer, transaction.atomic():
+            existing = {
+                (vote.user_id, vote.question_id): vote
+                for vote in self.select_for_update().filter(
+                    user_id__in={user_id for user_id, _ in votes},
+                    question_id__in={question_id for _, question_id in votes})
+            }
+            for (user_id, question_id), choice_id in votes.items():
+                vote = existing.get((user_id, question_id))
+                if vote is None:
+                    new_votes.append(self.model(user_id=user_id,
+                                                question_id=question_id,
+                                                choice_id=choice_id,
+                                                voted_at=now))
+                    question_deltas[question_id] += 1
+                elif vote.choice_id != choice_id:
+                    choice_deltas[vote.choice_id] -= 1
+                    vote.choice_id = choice_id
+                    vote.voted_at = now
+                    changed_votes.append(vote)
+                else:
+                    continue
+                choice_deltas[choice_id] += 1
+
+            self.bulk_create(new_votes, update_conflicts=True,
+                             unique_fields=['user', 'question'],
+                             update_fields=['choice', 'voted_at'])
+            self.bulk_update(changed_votes, ['choice', 'voted_at'])
+            lock_timer.locked()
+            Choice.objects.bulk_update(
+                [Choice(pk=pk, votes=F('votes') + delta)
+                 for pk, delta in choice_deltas.items() if delta],
+                ['votes'])
+            Question.objects.bulk_update(
+                [Question(pk=pk, total_votes=F('total_votes') + delta)
+                 for pk, delta in question_deltas.items()],
+                ['total_votes'])
+
+
 class Vote(models.Model):
     """
     Record a vote of a Choice by a User.
 
     Attributes:
+        question (Question) : Foreign key to associate each vote
+        with a question, a user can vote once per question.
         choice (Choice) : Foreign key to associate each vote
         with a choice.
         user (User) : Foreign key to associate each vote
         with a user.
+        voted_at (datetime) : Field for the time of the latest vote, None
+        for votes cast before votes were dated.
     """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    voted_at = models.DateTimeField('date voted', default=timezone.now,
+                                    null=True)
+
+    objects = VoteManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='polls_vote_user_question_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'voted_at'],
+                         name='polls_vote_question_date_idx'),
+        ]
@@ -0,0 +1,108 @@
+"""
+Keyset pagination of questions, newest first.
+
+A page is found by its position in the (pub_date, id) order instead of an
+OFFSET, so every page costs one index range scan of page size rows no
+matter how deep it is.
+"""
+import base64
+import binascii
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+@dataclass
+class KeysetPage:
+    """
+    A page of questions.
+
+    Attributes:
+        items (list) : Questions of the page, newest first.
+        next_token (str) : Cursor of the page of older questions or None.
+        previous_token (str) : Cursor of the page of newer questions
+        or None.
+    """
+    items: list = field(default_factory=list)
+    next_token: str = None
+    previous_token: str = None
+
+
+def encode_cursor(direction, question):
+    """ Encode the position of a question as a URL-safe cursor. """
+    position = f"{direction}|{question.pub_date.isoformat()}|{question.pk}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor made by encode_cursor().
+
+    Return :
+        tuple: direction, pub_date and id, or None if the cursor
+        is not valid.
+    """
+    try:
+        position = base64.urlsafe_b64decode(token.encode()).decode()
+        direction, pub_date, pk = position.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if direction not in ('next', 'previous') or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def page_queryset(queryset, token, page_size):
+    """
+    Return the query of the page of a cursor, with one extra row that
+    tells whether there is another page in the same direction.
+
+    Return :
+        tuple: the queryset and the decoded cursor or None for the
+        first page.
+    """
+    cursor = decode_cursor(token) if token else None
+    if cursor is None:
+        queryset = queryset.order_by('-pub_date', '-id')
+    elif cursor[0] == 'next':
+        _, pub_date, pk = cursor
+        queryset = queryset.filter(
+            Q(pub_date__lt=pub_date) | Q(id__lt=pk),
+            pub_date__lte=pub_date).order_by('-pub_date', '-id')
+    else:
+        _, pub_date, pk = cursor
+        queryset = queryset.filter(
+            Q(pub_date__gt=pub_date) | Q(id__gt=pk),
+            pub_date__gte=pub_date).order_by('pub_date', 'id')
+    return queryset[:page_size + 1], cursor
+
+
+def make_page(rows, cursor, page_size):
+    """ Build the KeysetPage of the rows of page_queryset(). """
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    backwards = cursor is not None and cursor[0] == 'previous'
+    if backwards:
+        rows.reverse()
+    page = KeysetPage(items=rows)
+    if rows:
+        if has_more or backwards:
+            page.next_token = encode_cursor('next', rows[-1])
+        if cursor is not None and (has_more or not backwards):
+            page.previous_token = encode_cursor('previous', rows[0])
+    return page
+
+
+def paginate(queryset, token, page_size):
+    """ Return the KeysetPage of queryset at the cursor token. """
+    queryset, cursor = page_queryset(queryset, token, page_size)
+    return make_page(list(queryset), cursor, page_size)
+
+
+async def apaginate(queryset, token, page_size):
+    """ Async version of paginate(). """
+    queryset, cursor = page_queryset(queryset, token, page_size)
+    return make_page([row async for row in queryset], cursor, page_size)
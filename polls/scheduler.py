@@ -0,0 +1,93 @@
+"""
+Work done around the opening and closing of polls, run by
+"python manage.py run_scheduler".
+
+The state of a poll follows from its pub_date and end_date, so every run
+looks at the polls that open or close around now instead of keeping a
+queue: the choices and results of polls about to open are cached before
+their first visitors arrive, the counter shards of closed polls are
+compacted, and the results of polls that closed long enough ago are
+frozen.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .cache import bump_poll_list_version, get_results, question_choices
+from .counters import compact
+from .models import ChoiceCounterShard, Question
+from .snapshots import final_questions, frozen_results
+
+
+def warm(question):
+    """ Cache what the first visitors of a question will ask for. """
+    question_choices(question.pk)
+    get_results(question.pk)
+
+
+def run(now=None, since=None):
+    """
+    Warm the polls that open within POLLS_SCHEDULER_WARM_AHEAD seconds,
+    compact the counters of polls that closed and freeze the results of
+    polls whose results are final. The cached question list is dropped
+    when a poll was published after since, the time of the previous run.
+
+    Return :
+        dict: the number of questions published, warmed, compacted and
+        frozen.
+    """
+    now = now or timezone.now()
+    published = Question.objects.filter(pub_date__lte=now)
+    if since is not None:
+        published = published.filter(pub_date__gt=since)
+    published = published.count()
+    if published:
+        bump_poll_list_version()
+
+    ahead = now + datetime.timedelta(
+        seconds=settings.POLLS_SCHEDULER_WARM_AHEAD)
+    warmed = 0
+    for question in Question.objects.filter(pub_date__gt=now,
+                                            pub_date__lte=ahead):
+        warm(question)
+        warmed += 1
+
+    closed_ids = list(ChoiceCounterShard.objects.exclude(votes=0)
+                      .filter(choice__question__end_date__lte=now)
+                      .values_list('choice__question_id', flat=True)
+                      .distinct())
+    compacted = compact(closed_ids) if closed_ids else 0
+
+    frozen = 0
+    for question in final_questions(now).iterator():
+        frozen_results(question)
+        frozen += 1
+    return {'published': published, 'warmed': warmed,
+            'compacted': compacted, 'frozen': frozen}
+
+
+def next_run(now=None):
+    """
+    Return the time of the next opening, closing or freezing of a poll
+    that run() should handle, or None if there is none.
+    """
+    now = now or timezone.now()
+    ahead = datetime.timedelta(seconds=settings.POLLS_SCHEDULER_WARM_AHEAD)
+    delay = datetime.timedelta(seconds=settings.POLLS_RESULTS_FREEZE_DELAY)
+    times = Question.objects.aggregate(
+        warming=Min('pub_date', filter=Q(pub_date__gt=now + ahead)),
+        opening=Min('pub_date', filter=Q(pub_date__gt=now)),
+        closing=Min('end_date', filter=Q(end_date__gt=now)),
+        final=Min('end_date', filter=Q(end_date__gt=now - delay)))
+    candidates = []
+    if times['warming'] is not None:
+        candidates.append(times['warming'] - ahead)
+    if times['opening'] is not None:
+        candidates.append(times['opening'])
+    if times['closing'] is not None:
+        candidates.append(times['closing'])
+    if times['final'] is not None:
+        candidates.append(times['final'] + delay)
+    return min(candidates, default=None)
@@ -0,0 +1,33 @@
+"""Receivers that keep the caches of the polls app in step with edits."""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_poll_list_version, forget_question_choices
+from .models import Choice, Question
+from .snapshots import forget_frozen_results
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    forget_frozen_results(instance.pk)
+    forget_question_choices(instance.pk)
+    bump_poll_list_version()
+
+
+@receiver(pre_save, sender=Choice)
+def choice_saving(sender, instance, using, **kwargs):
+    # A choice moved to another question leaves the choices of both.
+    instance._previous_question_id = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_question_id = (
+            Choice.objects.using(using).filter(pk=instance.pk)
+            .values_list('question_id', flat=True).first())
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    question_ids = {instance.question_id,
+                    getattr(instance, '_previous_question_id', None)}
+    question_ids.discard(None)
+    forget_frozen_results(*question_ids)
+    forget_question_choices(*question_ids)
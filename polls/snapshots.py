@@ -0,0 +1,167 @@
+"""
+Frozen results of closed polls.
+
+The results of a question cannot change once its end date has passed, so
+they are written once to ResultSnapshot rows, the first time they are
+requested or by "python manage.py freeze_results". The question and its
+frozen results are then kept in the cache without timeout, and served
+with an ETag and a long Cache-Control lifetime.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                quote_etag)
+
+from mysite.routers import pin_to_primary
+
+from .cache import compute_results
+from .models import Question, ResultSnapshot
+
+
+def _frozen_key(question_id):
+    return f'polls:frozen-results:{question_id}'
+
+
+def _final_before(now=None):
+    delay = datetime.timedelta(seconds=settings.POLLS_RESULTS_FREEZE_DELAY)
+    return (now or timezone.now()) - delay
+
+
+def is_final(question):
+    """
+    Return True if the results of a question can no longer change, that
+    is POLLS_RESULTS_FREEZE_DELAY seconds after its end date, when votes
+    accepted before the end have left the vote buffer.
+    """
+    return (question.end_date is not None
+            and question.end_date <= _final_before())
+
+
+def final_questions(now=None):
+    """ Return the questions whose results are final but not frozen. """
+    snapshots = ResultSnapshot.objects.filter(question=OuterRef('pk'),
+                                              closed_at=OuterRef('end_date'))
+    return (Question.objects.filter(end_date__lte=_final_before(now))
+            .filter(~Exists(snapshots)))
+
+
+def _snapshot_results(question):
+    rows = list(ResultSnapshot.objects
+                .filter(question=question, closed_at=question.end_date)
+                .order_by('choice_id')
+                .values('choice_id', 'choice__choice_text', 'votes', 'total'))
+    choices = [{'id': row['choice_id'],
+                'choice_text': row['choice__choice_text'],
+                'votes': row['votes'],
+                'total': row['total'],
+                'percent': (row['votes'] * 100.0 / row['total']
+                            if row['total'] else 0.0)}
+               for row in rows]
+    return {'choices': choices,
+            'total': choices[0]['total'] if choices else 0}
+
+
+def freeze(question):
+    """
+    Write the snapshot of the final results of a question, replacing a
+    snapshot taken before its end date was changed.
+
+    Return :
+        dict: the results, like polls.cache.compute_results().
+
+    Raise :
+        ValueError: if the results of the question are not final.
+    """
+    if not is_final(question):
+        raise ValueError(f"The results of question {question.pk} are not "
+                         f"final yet.")
+    with transaction.atomic():
+        results = compute_results(question.pk)
+        ResultSnapshot.objects.filter(question=question).exclude(
+            closed_at=question.end_date).delete()
+        ResultSnapshot.objects.bulk_create(
+            [ResultSnapshot(question=question, choice_id=choice['id'],
+                            votes=choice['votes'], total=results['total'],
+                            closed_at=question.end_date)
+             for choice in results['choices']],
+            ignore_conflicts=True)
+    return results
+
+
+def frozen_results(question):
+    """
+    Return the frozen results of a question whose results are final,
+    from its snapshot or by freezing them, and cache them.
+
+    Return :
+        dict: 'question', 'results' and 'version', a digest of what the
+        page shows, the same in every process and after the cache is
+        filled again.
+    """
+    with pin_to_primary():
+        results = _snapshot_results(question)
+    if not results['choices']:
+        results = freeze(question)
+    frozen = {'question': question, 'results': results,
+              'version': _digest(question, results)}
+    cache.set(_frozen_key(question.pk), frozen, None)
+    return frozen
+
+
+def _digest(question, results):
+    content = json.dumps([question.question_text,
+                          question.end_date.isoformat(), results],
+                         sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def cached_frozen_results(question_id):
+    """ Return the cached frozen results of a question, or None. """
+    return cache.get(_frozen_key(question_id))
+
+
+async def acached_frozen_results(question_id):
+    """ Async version of cached_frozen_results(). """
+    return await cache.aget(_frozen_key(question_id))
+
+
+def forget_frozen_results(*question_ids):
+    """ Drop the cached frozen results of questions after an edit. """
+    cache.delete_many([_frozen_key(question_id)
+                       for question_id in question_ids])
+
+
+def frozen_response(request, template_name, frozen):
+    """
+    Render the frozen results of a question, or answer 304 Not Modified
+    when the browser has them already.
+
+    The ETag differs for every user, whose name is on the page, and
+    pages that show a message are not cached.
+    """
+    etag = quote_etag(f"{frozen['question'].pk}-{frozen['version']}-"
+                      f"{request.user.pk or 0}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(request, template_name,
+                          {'question': frozen['question'],
+                           'results': frozen['results'],
+                           'frozen': True})
+        if messages.get_messages(request).used:
+            return response
+    response['ETag'] = etag
+    max_age = settings.POLLS_FROZEN_RESULTS_MAX_AGE
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, max_age=max_age)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
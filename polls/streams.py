@@ -0,0 +1,107 @@
+"""
+Live poll results as Server-Sent Events.
+
+All watchers of a question in a process share one ResultsChannel. The
+channel checks the results version of the question once per interval
+and reads the results only when a vote has changed it, so N watchers
+cost one computation and get at most one message per interval.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cache import aget_results, aresults_version
+
+
+class ResultsChannel:
+    """ In-process fan-out of the results of one question. """
+
+    def __init__(self, question_id, interval):
+        self.question_id = question_id
+        self.interval = interval
+        self.subscribers = set()
+        self.latest = None
+        self._loop = asyncio.get_running_loop()
+        self._task = None
+
+    def subscribe(self):
+        """
+        Return a queue that receives the results of the question.
+
+        The queue holds only the newest results, so a slow watcher skips
+        the updates it missed instead of falling behind.
+        """
+        queue = asyncio.Queue(maxsize=1)
+        self.subscribers.add(queue)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        """ Stop sending to queue, the last watcher stops the channel. """
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            _channels.pop((self._loop, self.question_id), None)
+
+    def publish(self, results):
+        self.latest = results
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(results)
+
+    async def _watch(self):
+        version = None
+        while True:
+            current = await aresults_version(self.question_id)
+            if current != version:
+                version = current
+                self.publish(await aget_results(self.question_id))
+            await asyncio.sleep(self.interval)
+
+
+_channels = {}
+
+
+def get_channel(question_id):
+    """ Return the results channel of a question in this event loop. """
+    key = (asyncio.get_running_loop(), question_id)
+    if key not in _channels:
+        _channels[key] = ResultsChannel(question_id,
+                                        settings.POLLS_STREAM_INTERVAL)
+    return _channels[key]
+
+
+def format_event(results):
+    """ Format results as a Server-Sent Event. """
+    data = json.dumps(results, cls=DjangoJSONEncoder)
+    return f"event: results\ndata: {data}\n\n"
+
+
+async def stream_results(question_id):
+    """
+    Yield Server-Sent Events with the results of a question until
+    settings.POLLS_STREAM_TIMEOUT has passed, the browser then
+    reconnects on its own.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.POLLS_STREAM_TIMEOUT
+    channel = get_channel(question_id)
+    queue = channel.subscribe()
+    try:
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                results = await asyncio.wait_for(queue.get(),
+                                                 min(remaining, 15))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(results)
+    finally:
+        channel.unsubscribe(queue)
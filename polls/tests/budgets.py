@@ -0,0 +1,27 @@
+"""A test helper that keeps views within a number of SQL queries."""
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Adds assertQueryBudget() to a TestCase. Unlike assertNumQueries(),
+    doing better than the budget passes, so a budget only has to change
+    when a view gets more expensive.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using='default'):
+        """
+        Fail if the block runs more than budget queries, listing them.
+        """
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            queries = "\n".join(f"{number}. {query['sql']}"
+                                for number, query
+                                in enumerate(context.captured_queries, 1))
+            self.fail(f"{len(context)} queries, over the budget of "
+                      f"{budget}:\n{queries}")
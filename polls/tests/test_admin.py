@@ -0,0 +1,178 @@
+"""Tests of the polls admin changelists and bulk actions."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import (Choice, ChoiceCounterShard, Question, ResultSnapshot,
+                          Vote)
+from polls.snapshots import cached_frozen_results, frozen_results
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        """
+        Set up an open question with two choices and three votes, a
+        closed question without choices, and a logged in superuser.
+        """
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        self.open = Question.objects.create(question_text="Open",
+                                            pub_date=now - day)
+        self.first = Choice.objects.create(question=self.open,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.open,
+                                            choice_text="Second")
+        self.closed = Question.objects.create(
+            question_text="Closed", pub_date=now - 3 * day,
+            end_date=now - 2 * day)
+        self.voters = [User.objects.create(username=f"voter{n}")
+                       for n in range(3)]
+        Vote.objects.record(self.voters[0], self.first)
+        Vote.objects.record(self.voters[1], self.first)
+        Vote.objects.record(self.voters[2], self.second)
+        admin = User.objects.create_superuser(username="admin",
+                                              password="admin1234")
+        self.client.force_login(admin)
+        self.question_url = reverse('admin:polls_question_changelist')
+
+    def changelist(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(200, response.status_code)
+        return response.context['cl'].result_list
+
+    def action(self, name, *questions):
+        return self.client.post(self.question_url, {
+            'action': name,
+            '_selected_action': [question.pk for question in questions],
+        }, follow=True)
+
+    def test_question_counts(self):
+        """
+        The question changelist shows the choices and votes of each
+        question, counter shards included.
+        """
+        ChoiceCounterShard.objects.create(choice=self.second, shard=1,
+                                          votes=2)
+        counts = {question.pk: (question.choice_count, question.vote_total)
+                  for question in self.changelist(self.question_url)}
+        self.assertEqual({self.open.pk: (2, 5), self.closed.pk: (0, 0)},
+                         counts)
+
+    def test_question_changelist_queries_do_not_grow(self):
+        """
+        The changelist runs as many queries for many questions as for a
+        few, the counts come from the page query.
+        """
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.changelist(self.question_url)
+            return len(context)
+
+        few = count_queries()
+        for number in range(10):
+            question = Question.objects.create(question_text=f"Q{number}")
+            Choice.objects.create(question=question, choice_text="A")
+        self.assertEqual(few, count_queries())
+
+    def test_sort_and_filter_by_counts(self):
+        """
+        The changelist sorts by votes and filters by votes and choices.
+        """
+        result = self.changelist(self.question_url, {'o': '-6'})
+        self.assertEqual([self.open, self.closed], list(result))
+        self.assertEqual([self.closed], list(self.changelist(
+            self.question_url, {'votes': 'none'})))
+        self.assertEqual([self.closed], list(self.changelist(
+            self.question_url, {'choices': 'none'})))
+
+    def test_choice_changelist(self):
+        """
+        The choice changelist shows and sorts by the votes of each
+        choice.
+        """
+        url = reverse('admin:polls_choice_changelist')
+        result = self.changelist(url, {'o': '-3'})
+        self.assertEqual([(self.first, 2), (self.second, 1)],
+                         [(choice, choice.tally) for choice in result])
+        self.assertEqual([], list(self.changelist(url, {'votes': 'none'})))
+
+    def test_close_now_and_reopen(self):
+        """
+        Closing stops voting on open questions, reopening restarts it on
+        closed ones and drops their frozen results.
+        """
+        frozen_results(self.closed)
+        self.action('close_now', self.open, self.closed)
+        self.open.refresh_from_db()
+        self.assertFalse(self.open.can_vote())
+
+        self.action('reopen', self.closed)
+        self.closed.refresh_from_db()
+        self.assertIsNone(self.closed.end_date)
+        self.assertIsNone(cached_frozen_results(self.closed.pk))
+
+    def test_reset_votes(self):
+        """
+        Resetting deletes the votes and zeroes every counter.
+        """
+        response = self.action('reset_votes', self.open)
+        self.assertContains(response, "Deleted 3 votes.")
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual([0, 0], list(Choice.objects.values_list(
+            'votes', flat=True)))
+        self.open.refresh_from_db()
+        self.assertEqual(0, self.open.total_votes)
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_recompute_totals(self):
+        """
+        Recomputing repairs counters that drifted from the votes.
+        """
+        Choice.objects.filter(pk=self.first.pk).update(votes=10)
+        response = self.action('recompute_totals', self.open, self.closed)
+        self.assertContains(response, "Repaired 1 counters.")
+        self.first.refresh_from_db()
+        self.assertEqual(2, self.first.votes)
+
+    def test_recompute_refreezes_closed_poll(self):
+        """
+        Recomputing the totals of a closed poll replaces its frozen
+        results with the repaired counts.
+        """
+        choice = Choice.objects.create(question=self.closed,
+                                       choice_text="Only")
+        Vote.objects.create(user=self.voters[0], question=self.closed,
+                            choice=choice)
+        self.assertEqual(0, frozen_results(self.closed)['results']['total'])
+        self.action('recompute_totals', self.closed)
+        self.assertIsNone(cached_frozen_results(self.closed.pk))
+        self.assertEqual(1, frozen_results(self.closed)['results']['total'])
+
+    def test_votes_read_only(self):
+        """
+        Votes can be listed and exported, but not added, changed or
+        deleted, which would leave the counters behind.
+        """
+        vote = Vote.objects.get(user=self.voters[0])
+        url = reverse('admin:polls_vote_changelist')
+        self.assertEqual(3, len(self.changelist(url)))
+        self.assertEqual(403, self.client.get(
+            reverse('admin:polls_vote_add')).status_code)
+        self.client.post(reverse('admin:polls_vote_change', args=(vote.pk,)),
+                         {'user': vote.user_id, 'question': self.open.pk,
+                          'choice': self.second.pk})
+        self.client.post(reverse('admin:polls_vote_delete', args=(vote.pk,)),
+                         {'post': 'yes'})
+        vote.refresh_from_db()
+        self.assertEqual(self.first, vote.choice)
+        response = self.client.post(url, {
+            'action': 'export_csv', '_selected_action': [vote.pk]})
+        self.assertEqual('text/csv', response['Content-Type'])
@@ -0,0 +1,97 @@
+"""Tests of the async polls views served under ASGI."""
+import datetime
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Choice, Vote
+
+
+@override_settings(ROOT_URLCONF='mysite.asgi_urls')
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        """
+        Set up a published question with two choices and a user.
+        """
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="voter1234")
+        self.question = Question.objects.create(
+            question_text="Test question",
+            pub_date=timezone.now() - datetime.timedelta(days=1))
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+
+    async def test_index(self):
+        """
+        The async index view lists published questions.
+        """
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, self.question.question_text)
+
+    async def test_detail_shows_previous_vote(self):
+        """
+        The async detail view marks the choice the user voted for.
+        """
+        await Vote.objects.acreate(user=self.user, question=self.question,
+                                   choice=self.second)
+        await sync_to_async(self.async_client.force_login)(self.user)
+        url = reverse('polls:detail', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(self.second.id, response.context['voted_choice_id'])
+        self.assertContains(response, "checked")
+
+    async def test_missing_question(self):
+        """
+        The async detail view redirects to the index for a missing question.
+        """
+        url = reverse('polls:detail', args=(self.question.id + 1,))
+        response = await self.async_client.get(url)
+        self.assertRedirects(response, reverse('polls:index'),
+                             fetch_redirect_response=False)
+
+    async def test_vote_and_results(self):
+        """
+        A vote through the async view is counted on the results page.
+        """
+        await sync_to_async(self.async_client.force_login)(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = await self.async_client.post(url,
+                                                {"choice": self.first.id})
+        results = reverse('polls:results', args=(self.question.id,))
+        self.assertRedirects(response, results,
+                             fetch_redirect_response=False)
+        response = await self.async_client.get(results)
+        self.assertEqual(1, response.context['results']['total'])
+
+    async def test_vote_requires_login(self):
+        """
+        An unauthenticated vote is redirected to the login page.
+        """
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = await self.async_client.post(url,
+                                                {"choice": self.first.id})
+        self.assertRedirects(response, f"{reverse('login')}?next={url}",
+                             fetch_redirect_response=False)
+
+    async def test_closed_poll_results_are_frozen(self):
+        """
+        The async results view serves a closed poll from its frozen
+        results, with an ETag.
+        """
+        self.question.end_date = timezone.now() - datetime.timedelta(hours=1)
+        await self.question.asave()
+        url = reverse('polls:results', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertTrue(response.context['frozen'])
+        response = await self.async_client.get(
+            url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(304, response.status_code)
@@ -0,0 +1,120 @@
+"""Tests of the cached choices of each question."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import question_choices
+from polls.models import Choice, Question, Vote
+
+
+class ChoiceCacheTests(TestCase):
+    def setUp(self):
+        """
+        Set up a published question with two choices and a logged in
+        user.
+        """
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text="Question",
+            pub_date=timezone.now() - datetime.timedelta(days=1))
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.user = User.objects.create_user(username="voter")
+        self.client.force_login(self.user)
+
+    def test_choices_cached(self):
+        """
+        The choices are read once, in order, then served from the cache.
+        """
+        with self.assertNumQueries(1):
+            choices = question_choices(self.question.id)
+        self.assertEqual([{'id': self.first.id, 'choice_text': "First"},
+                          {'id': self.second.id, 'choice_text': "Second"}],
+                         choices)
+        with self.assertNumQueries(0):
+            question_choices(self.question.id)
+
+    def test_no_choices_not_cached(self):
+        """
+        An empty list is not cached, so choices added later show up.
+        """
+        question = Question.objects.create(question_text="Empty")
+        self.assertEqual([], question_choices(question.id))
+        Choice.objects.bulk_create([Choice(question=question,
+                                           choice_text="Late")])
+        self.assertEqual(["Late"], [choice['choice_text'] for choice
+                                    in question_choices(question.id)])
+
+    def test_edits_invalidate_choices(self):
+        """
+        Saving, adding and deleting choices shows on the detail page.
+        """
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.client.get(url)
+        self.first.choice_text = "Renamed"
+        self.first.save()
+        Choice.objects.create(question=self.question, choice_text="Third")
+        self.second.delete()
+        response = self.client.get(url)
+        self.assertContains(response, "Renamed")
+        self.assertContains(response, "Third")
+        self.assertNotContains(response, "Second")
+
+    def test_moved_choice_leaves_old_question(self):
+        """
+        A choice moved to another question is no longer a choice of, nor
+        a valid vote for, its old question.
+        """
+        other = Question.objects.create(
+            question_text="Other",
+            pub_date=timezone.now() - datetime.timedelta(days=1))
+        question_choices(self.question.id)
+        question_choices(other.id)
+        self.second.question = other
+        self.second.save()
+        self.assertEqual([self.first.id], [
+            choice['id'] for choice in question_choices(self.question.id)])
+        self.assertEqual([self.second.id], [
+            choice['id'] for choice in question_choices(other.id)])
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.client.post(url, {'choice': self.second.id})
+        self.assertFalse(Vote.objects.exists())
+
+    def test_vote_without_choice_query(self):
+        """
+        The vote view checks the choice among the cached choices.
+        """
+        question_choices(self.question.id)
+        url = reverse('polls:vote', args=(self.question.id,))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {'choice': self.second.id})
+        self.assertFalse([query for query in context.captured_queries
+                          if query['sql'].startswith('SELECT')
+                          and 'FROM "polls_choice"' in query['sql']])
+        self.assertRedirects(response, reverse('polls:results',
+                                               args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        self.assertEqual(self.second.id, Vote.objects.get().choice_id)
+
+    def test_vote_for_choice_of_other_question(self):
+        """
+        A choice of another question is rejected.
+        """
+        other = Question.objects.create(question_text="Other")
+        choice = Choice.objects.create(question=other, choice_text="Other")
+        url = reverse('polls:vote', args=(self.question.id,))
+        for value in (choice.id, "not a number"):
+            response = self.client.post(url, {'choice': value})
+            self.assertRedirects(response, reverse(
+                'polls:detail', args=(self.question.id,)),
+                fetch_redirect_response=False)
+        self.assertFalse(Vote.objects.exists())
@@ -0,0 +1,146 @@
+"""Tests of the counter shards of hot polls."""
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from polls.cache import get_results
+from polls.counters import compact, reconcile
+from polls.models import Choice, ChoiceCounterShard, Question, Vote
+
+
+class CounterShardTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question with four counter shards, two choices and
+        three users.
+        """
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Hot question",
+                                                counter_shards=4)
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.users = [User.objects.create(username=f"voter{number}")
+                      for number in range(3)]
+
+    def shard_votes(self, choice):
+        return dict(choice.shards.values_list('shard', 'votes'))
+
+    def test_record_updates_shard_of_user(self):
+        """
+        A vote goes to the shard of its user and leaves the counters of
+        the choice and the question alone.
+        """
+        user = self.users[0]
+        Vote.objects.record(user, self.first)
+        self.first.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual({user.pk % 4: 1}, self.shard_votes(self.first))
+        self.assertEqual(0, self.first.votes)
+        self.assertEqual(0, self.question.total_votes)
+
+    def test_change_vote_moves_shard_vote(self):
+        """
+        Changing a vote moves one vote between the shards of the user.
+        """
+        user = self.users[0]
+        Vote.objects.record(user, self.first)
+        Vote.objects.record(user, self.second)
+        self.assertEqual({user.pk % 4: 0}, self.shard_votes(self.first))
+        self.assertEqual({user.pk % 4: 1}, self.shard_votes(self.second))
+
+    def test_results_add_shards(self):
+        """
+        The results count the votes of the choices and of their shards.
+        """
+        Choice.objects.filter(pk=self.first.pk).update(votes=2)
+        for user in self.users:
+            Vote.objects.record(user, self.first)
+        Vote.objects.record(self.users[0], self.second)
+        results = get_results(self.question.id)
+        self.assertEqual(5, results['total'])
+        self.assertEqual([4, 1], [choice['votes']
+                                  for choice in results['choices']])
+
+    def test_vote_view_counts_in_results(self):
+        """
+        A vote through the vote view shows in the results page.
+        """
+        self.client.force_login(self.users[0])
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {'choice': self.second.id})
+        response = self.client.get(reverse('polls:results',
+                                           args=(self.question.id,)))
+        self.assertEqual(1, response.context['results']['total'])
+
+    def test_compact_folds_shards(self):
+        """
+        Compaction moves the votes of the shards into the choices and the
+        question total, and empties the shards.
+        """
+        for user in self.users:
+            Vote.objects.record(user, self.first)
+        Vote.objects.record(self.users[0], self.second)
+        before = get_results(self.question.id)
+        self.assertEqual(1, compact())
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((2, 1), (self.first.votes, self.second.votes))
+        self.assertEqual(3, self.question.total_votes)
+        self.assertFalse(ChoiceCounterShard.objects.exclude(votes=0).exists())
+        cache.clear()
+        self.assertEqual(before, get_results(self.question.id))
+        self.assertEqual(0, compact())
+
+    def test_compact_command(self):
+        """
+        compact_counters --once compacts every question and exits.
+        """
+        Vote.objects.record(self.users[0], self.first)
+        call_command('compact_counters', once=True, stdout=StringIO())
+        self.first.refresh_from_db()
+        self.assertEqual(1, self.first.votes)
+
+    def test_reconcile_empties_shards(self):
+        """
+        Reconciling counts every vote in the choices and empties their
+        shards, so no vote is counted twice.
+        """
+        for user in self.users:
+            Vote.objects.record(user, self.second)
+        self.assertEqual(2, reconcile([self.question.id]))
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(3, self.second.votes)
+        self.assertEqual(3, self.question.total_votes)
+        self.assertEqual({0}, set(self.shard_votes(self.second).values()))
+
+    def test_reconcile_keeps_votes_cast_meanwhile(self):
+        """
+        A vote that reaches a shard after the votes were counted stays
+        in the shard, instead of being emptied with it.
+        """
+        Vote.objects.record(self.users[0], self.second)
+        bulk_update = Choice.objects.bulk_update
+
+        def vote_meanwhile(*args, **kwargs):
+            Vote.objects.record(self.users[1], self.second)
+            return bulk_update(*args, **kwargs)
+
+        with mock.patch.object(Choice.objects, 'bulk_update',
+                               vote_meanwhile):
+            reconcile([self.question.id])
+        self.second.refresh_from_db()
+        self.assertEqual(1, self.second.votes)
+        self.assertEqual(2, get_results(self.question.id)['total'])
+        compact([self.question.id])
+        self.question.refresh_from_db()
+        self.assertEqual(2, self.question.total_votes)
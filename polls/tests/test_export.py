@@ -0,0 +1,137 @@
+"""Tests of the streaming vote export."""
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Choice, Vote
+
+
+class VoteExportTests(TestCase):
+    def setUp(self):
+        """
+        Set up two questions with one old and one new vote, and
+        a staff user.
+        """
+        super().setUp()
+        self.staff = User.objects.create_user(username="staff",
+                                              is_staff=True)
+        self.voter = User.objects.create_user(username="voter")
+        self.question = Question.objects.create(question_text="First?")
+        self.other = Question.objects.create(question_text="Second?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+        other_choice = Choice.objects.create(question=self.other,
+                                             choice_text="No")
+        self.old_vote = Vote.objects.create(
+            user=self.voter, question=self.question, choice=self.choice,
+            voted_at=timezone.now() - datetime.timedelta(days=10))
+        self.new_vote = Vote.objects.create(
+            user=self.voter, question=self.other, choice=other_choice)
+
+    def export(self, url_name='polls:export', args=(), **params):
+        """Return the response of an export request as staff."""
+        self.client.force_login(self.staff)
+        return self.client.get(reverse(url_name, args=args), params)
+
+    def test_export_csv(self):
+        """
+        The CSV export has a header and a row for each vote.
+        """
+        response = self.export()
+        self.assertEqual('text/csv', response['Content-Type'])
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([str(self.old_vote.pk), str(self.new_vote.pk)],
+                         [row['vote_id'] for row in rows])
+        self.assertEqual("voter", rows[0]['username'])
+        self.assertEqual("Yes", rows[0]['choice_text'])
+
+    def test_export_question_jsonl_gzip(self):
+        """
+        The gzipped JSON Lines export of a question only has its votes.
+        """
+        response = self.export('polls:export_question', (self.question.id,),
+                               format='jsonl', gzip='1')
+        self.assertEqual('application/gzip', response['Content-Type'])
+        self.assertIn('votes-%d.jsonl.gz' % self.question.id,
+                      response['Content-Disposition'])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([self.old_vote.pk], [row['vote_id'] for row in rows])
+        self.assertEqual("First?", rows[0]['question_text'])
+
+    def test_export_date_range(self):
+        """
+        The since and until filters select votes by date.
+        """
+        since = (timezone.now() - datetime.timedelta(days=1)).date()
+        response = self.export(format='jsonl', since=since.isoformat())
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual([self.new_vote.pk],
+                         [json.loads(line)['vote_id'] for line in lines])
+
+    def test_undated_vote(self):
+        """
+        A vote cast before votes were dated is exported without a date,
+        and left out of date ranges.
+        """
+        Vote.objects.filter(pk=self.old_vote.pk).update(voted_at=None)
+        lines = b"".join(self.export(format='jsonl').streaming_content)
+        self.assertIsNone(json.loads(lines.splitlines()[0])['voted_at'])
+        since = (timezone.now() - datetime.timedelta(days=30)).date()
+        response = self.export(format='jsonl', since=since.isoformat())
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual([self.new_vote.pk],
+                         [json.loads(line)['vote_id'] for line in lines])
+
+    def test_invalid_option(self):
+        """
+        An unknown format or date answers 400.
+        """
+        self.assertEqual(400, self.export(format='xml').status_code)
+        self.assertEqual(400, self.export(since='yesterday').status_code)
+
+    def test_export_requires_staff(self):
+        """
+        Only staff can export votes.
+        """
+        self.client.force_login(self.voter)
+        response = self.client.get(reverse('polls:export'))
+        self.assertEqual(302, response.status_code)
+
+    def test_export_command(self):
+        """
+        export_votes writes the export to a file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "votes.csv.gz")
+            call_command('export_votes', question=self.other.id, gzip=True,
+                         output=path)
+            with gzip.open(path, 'rt') as file:
+                rows = list(csv.DictReader(file))
+        self.assertEqual([str(self.new_vote.pk)],
+                         [row['vote_id'] for row in rows])
+
+    @override_settings(ROOT_URLCONF='mysite.asgi_urls')
+    async def test_async_export(self):
+        """
+        The async export streams the votes from an async iterator.
+        """
+        from asgiref.sync import sync_to_async
+        await sync_to_async(self.client.force_login)(self.staff)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(reverse('polls:export'),
+                                               {'format': 'jsonl'})
+        content = b"".join([chunk async for chunk
+                            in response.streaming_content])
+        self.assertEqual(2, len(content.splitlines()))
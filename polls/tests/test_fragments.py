@@ -0,0 +1,112 @@
+"""Tests of the cached question table of the poll index."""
+import datetime
+import threading
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.fragments import _timeout, cached_fragment
+from polls.models import Question
+
+
+class IndexFragmentTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text="Published question",
+            pub_date=timezone.now() - datetime.timedelta(days=1))
+        self.url = reverse('polls:index')
+
+    def test_cached_table_without_queries(self):
+        """
+        The question table is read once, then served from the cache.
+        """
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Published question")
+        self.assertEqual([self.question],
+                         response.context['latest_question_list'])
+
+    def test_user_header_not_cached(self):
+        """
+        The header shows the user of each request around the shared
+        table.
+        """
+        self.client.get(self.url)
+        user = User.objects.create_user(username="visitor")
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertContains(response, "Published question")
+        self.assertContains(response, user.username)
+
+    def test_edit_invalidates_table(self):
+        """
+        Saving or deleting a question shows in the next response.
+        """
+        self.client.get(self.url)
+        self.question.question_text = "Edited question"
+        self.question.save()
+        self.assertContains(self.client.get(self.url), "Edited question")
+        self.question.delete()
+        self.assertContains(self.client.get(self.url),
+                            "No polls are available.")
+
+    @override_settings(POLLS_INDEX_CACHE_TIMEOUT=300)
+    def test_timeout_until_next_publication(self):
+        """
+        The table expires when the next question is published.
+        """
+        soon = timezone.now() + datetime.timedelta(seconds=30)
+        self.assertLessEqual(_timeout(soon), 31)
+        self.assertEqual(300, _timeout(None))
+        self.assertEqual(300, _timeout(soon + datetime.timedelta(hours=1)))
+
+
+class CachedFragmentTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_build_once(self):
+        """
+        A missing fragment is built and cached for the given seconds.
+        """
+        calls = []
+
+        def build():
+            calls.append(1)
+            return 'fragment', 60
+
+        self.assertEqual('fragment', cached_fragment('key', build))
+        self.assertEqual('fragment', cached_fragment('key', build))
+        self.assertEqual(1, len(calls))
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_wait_for_other_builder(self):
+        """
+        While another worker holds the rebuild lock, a miss waits for its
+        fragment instead of building it again.
+        """
+        cache.add('key:lock', 1, 5)
+        timer = threading.Timer(0.1, cache.set, ('key', 'theirs', 60))
+        timer.start()
+
+        def build():
+            raise AssertionError("built twice")
+
+        self.assertEqual('theirs', cached_fragment('key', build))
+        timer.join()
+
+    @override_settings(POLLS_FRAGMENT_LOCK_TIMEOUT=0.1)
+    def test_build_after_lock_timeout(self):
+        """
+        A worker that waited in vain builds the fragment itself.
+        """
+        cache.add('key:lock', 1, 5)
+        self.assertEqual('mine', cached_fragment('key',
+                                                 lambda: ('mine', 60)))
@@ -0,0 +1,137 @@
+"""Tests of the streaming fixture importer."""
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from polls.cache import question_choices
+from polls.fixtures import iter_records
+from polls.models import Question, Choice, Vote
+
+
+class IterRecordsTests(TestCase):
+    def test_json_array_in_small_chunks(self):
+        """
+        Records of a JSON array are read even when a record spans
+        several chunks.
+        """
+        records = [{"pk": n, "text": "x" * n} for n in range(20)]
+        stream = io.StringIO(json.dumps(records, indent=2))
+        self.assertEqual(records, list(iter_records(stream, chunk_size=7)))
+
+    def test_json_lines(self):
+        """
+        Records of a JSON Lines stream are read one per line.
+        """
+        stream = io.StringIO('{"pk": 1}\n\n{"pk": 2}')
+        self.assertEqual([{"pk": 1}, {"pk": 2}],
+                         list(iter_records(stream, chunk_size=3)))
+
+    def test_truncated_array(self):
+        """
+        A truncated JSON array raises ValueError.
+        """
+        stream = io.StringIO('[{"pk": 1}, {"pk"')
+        with self.assertRaises(ValueError):
+            list(iter_records(stream, chunk_size=4))
+
+
+class ImportPollsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def import_polls(self, *paths, **options):
+        """Run import_polls and return its output."""
+        out = StringIO()
+        call_command('import_polls', *paths, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_data_fixtures(self):
+        """
+        The fixtures in data/ are imported, votes get their question from
+        their choice and the vote counters are built.
+        """
+        data = settings.BASE_DIR / 'data'
+        self.import_polls(data / 'users.json', data / 'polls.json',
+                          batch_size=4)
+        self.assertEqual(6, User.objects.count())
+        self.assertEqual(5, Question.objects.count())
+        self.assertEqual(46, Choice.objects.count())
+        self.assertEqual(12, Vote.objects.count())
+        for question in Question.objects.all():
+            self.assertEqual(
+                Vote.objects.filter(question=question).count(),
+                question.total_votes)
+        for vote in Vote.objects.select_related('choice'):
+            self.assertEqual(vote.choice.question_id, vote.question_id)
+
+    def test_import_json_lines(self):
+        """
+        JSON Lines records are imported and existing rows are updated,
+        a vote without a date stays undated.
+        """
+        Question.objects.create(pk=1, question_text="Old text")
+        User.objects.create_user(pk=1, username="voter")
+        lines = [
+            {"model": "polls.question", "pk": 1,
+             "fields": {"question_text": "New text",
+                        "pub_date": "2023-09-02T14:33:10Z"}},
+            {"model": "polls.choice", "pk": 1,
+             "fields": {"question": 1, "choice_text": "Yes"}},
+            {"model": "polls.vote", "pk": 1,
+             "fields": {"choice": 1, "user": 1}},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "polls.jsonl")
+            with open(path, "w") as file:
+                file.write("\n".join(json.dumps(line) for line in lines))
+            self.import_polls(path)
+        question = Question.objects.get(pk=1)
+        self.assertEqual("New text", question.question_text)
+        self.assertEqual(1, question.total_votes)
+        self.assertEqual(1, Choice.objects.get(pk=1).votes)
+        self.assertIsNone(Vote.objects.get().voted_at)
+
+    def test_vote_for_unknown_choice(self):
+        """
+        A vote for a choice that does not exist stops the import.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "votes.jsonl")
+            with open(path, "w") as file:
+                file.write(json.dumps({"model": "polls.vote", "pk": 1,
+                                       "fields": {"choice": 9, "user": 1}}))
+            with self.assertRaises(CommandError):
+                self.import_polls(path)
+
+    def test_import_drops_cached_choices(self):
+        """
+        Choices imported into a question, or moved out of one, show in
+        the cached choices of both questions.
+        """
+        first = Question.objects.create(pk=1, question_text="First")
+        second = Question.objects.create(pk=2, question_text="Second")
+        Choice.objects.create(pk=1, question=first, choice_text="Moved")
+        self.assertEqual(1, len(question_choices(first.pk)))
+        Choice.objects.create(pk=2, question=second, choice_text="Kept")
+        self.assertEqual(1, len(question_choices(second.pk)))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "choices.jsonl")
+            with open(path, "w") as file:
+                file.write(json.dumps(
+                    {"model": "polls.choice", "pk": 1,
+                     "fields": {"question": 2, "choice_text": "Moved"}}))
+            self.import_polls(path)
+        self.assertEqual([], question_choices(first.pk))
+        self.assertEqual(["Moved", "Kept"],
+                         [choice['choice_text']
+                          for choice in question_choices(second.pk)])
@@ -1,5 +1,6 @@
 import datetime
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.urls import reverse
@@ -18,6 +19,10 @@ def create_question(question_text, days):
 
 
 class QuestionIndexViewTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
     def test_no_questions(self):
         """
         If no questions exist, an appropriate message is displayed.
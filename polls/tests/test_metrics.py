@@ -0,0 +1,181 @@
+"""Tests of the metrics registry and the /metrics page."""
+import os
+import subprocess
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from mysite.metrics import (Counter, Gauge, Histogram, Registry,
+                            _snapshot_name, exposition)
+from polls.models import Choice, Question
+
+
+def sample(text, line_start):
+    """ Return the value of the exposition line of a sample. """
+    for line in text.splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+class RegistryTests(SimpleTestCase):
+    def test_exposition_format(self):
+        """
+        Counters, gauges and histograms are written in the Prometheus
+        text format, histogram buckets are cumulative.
+        """
+        registry = Registry()
+        votes = Counter('votes_total', "Votes.", ['reason'],
+                        registry=registry)
+        pending = Gauge('pending', "Pending.", registry=registry)
+        latency = Histogram('latency_seconds', "Latency.",
+                            buckets=(.1, 1), registry=registry)
+        votes.inc(reason='closed')
+        votes.inc(2, reason='closed')
+        pending.set(5)
+        for value in (.05, .5, 5):
+            latency.observe(value)
+
+        text = exposition(registry.snapshot())
+        self.assertIn('# TYPE votes_total counter', text)
+        self.assertIn('votes_total{reason="closed"} 3.0', text)
+        self.assertIn('pending 5.0', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1.0', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2.0', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3.0', text)
+        self.assertIn('latency_seconds_count 3.0', text)
+
+    def test_wrong_labels(self):
+        registry = Registry()
+        votes = Counter('votes_total', "Votes.", ['reason'],
+                        registry=registry)
+        with self.assertRaises(ValueError):
+            votes.inc(result='closed')
+
+    def test_processes_add_up(self):
+        """
+        With METRICS_DIR, the metrics of every process that wrote a
+        snapshot are added up, gauges are kept apart by pid.
+        """
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            other = Registry()
+            Counter('votes_total', "Votes.", registry=other).inc(4)
+            Gauge('pending', "Pending.", registry=other).set(1)
+            other.write()
+            # Pretend the snapshot came from another running process.
+            os.replace(os.path.join(directory, _snapshot_name()),
+                       os.path.join(directory, f'{os.getppid()}-1.json'))
+
+            registry = Registry()
+            Counter('votes_total', "Votes.", registry=registry).inc(1)
+            Gauge('pending', "Pending.", registry=registry).set(2)
+            text = exposition(registry.collect())
+        self.assertIn('votes_total 5.0', text)
+        self.assertIn(f'pending{{pid="{os.getpid()}"}} 2.0', text)
+        self.assertIn(f'pending{{pid="{os.getppid()}"}} 1.0', text)
+
+    def test_exited_processes_retired(self):
+        """
+        The snapshots of exited processes are folded into one file, and
+        their counters still add up.
+        """
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory):
+            for count in (4, 2):
+                other = Registry()
+                Counter('votes_total', "Votes.", registry=other).inc(count)
+                Gauge('pending', "Pending.", registry=other).set(1)
+                other.write()
+                os.replace(os.path.join(directory, _snapshot_name()),
+                           os.path.join(directory,
+                                        f'{exited.pid}-{count}.json'))
+
+            registry = Registry()
+            Counter('votes_total', "Votes.", registry=registry).inc(1)
+            Gauge('pending', "Pending.", registry=registry).set(2)
+            text = exposition(registry.collect())
+            self.assertEqual({'retired.json', _snapshot_name()},
+                             {name for name in os.listdir(directory)
+                              if name.endswith('.json')})
+            self.assertIn('votes_total 7.0', exposition(registry.collect()))
+        self.assertIn('votes_total 7.0', text)
+        self.assertNotIn(f'pid="{exited.pid}"', text)
+
+
+class MetricsPageTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="secret")
+        self.question = Question.objects.create(question_text="Question")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="A")
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual('text/plain; version=0.0.4', response['Content-Type'])
+        return response.content.decode()
+
+    def test_votes_by_outcome(self):
+        """
+        Accepted votes and rejected votes by reason are counted.
+        """
+        before = self.metrics()
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.client.post(url, {'choice': self.choice.id})
+        self.client.force_login(self.user)
+        self.client.post(url, {'choice': 0})
+        self.client.post(url, {'choice': self.choice.id})
+        after = self.metrics()
+
+        def change(line):
+            return sample(after, line) - sample(before, line)
+
+        self.assertEqual(1, change('polls_votes_accepted_total'))
+        for reason in ('unauthenticated', 'missing_choice'):
+            self.assertEqual(1, change(
+                f'polls_votes_rejected_total{{reason="{reason}"}}'))
+        self.assertEqual(1, change('polls_vote_lock_wait_seconds_count'))
+        self.assertEqual(1, change('polls_vote_lock_held_seconds_count'))
+
+    def test_cache_and_latency(self):
+        """
+        Results cache lookups and request latencies per view are counted.
+        """
+        before = self.metrics()
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        self.client.get(url)
+        after = self.metrics()
+
+        def change(line):
+            return sample(after, line) - sample(before, line)
+
+        cache_lookups = 'polls_results_cache_requests_total{result="%s"}'
+        self.assertEqual(1, change(cache_lookups % 'miss'))
+        self.assertEqual(1, change(cache_lookups % 'hit'))
+        self.assertEqual(2, change(
+            'polls_request_duration_seconds_count{view="polls:results"}'))
+
+    def test_gauges(self):
+        """
+        The results cache hit ratio of the process is reported, and no
+        password hash is left in flight after a signup.
+        """
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        self.client.get(url)
+        self.client.post(reverse('signup'), {"username": "newbie",
+                                             "password1": "TS12345678",
+                                             "password2": "TS12345678"})
+        text = self.metrics()
+        self.assertIn('# TYPE polls_results_cache_hit_ratio gauge', text)
+        self.assertGreater(sample(text, 'polls_results_cache_hit_ratio'), 0)
+        self.assertIn('polls_password_hashes_in_flight 0', text)
@@ -0,0 +1,80 @@
+"""Tests of the keyset pagination of the poll index."""
+import datetime
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+from polls.pagination import decode_cursor
+
+
+@override_settings(POLLS_INDEX_PAGE_SIZE=2)
+class IndexPaginationTests(TestCase):
+    def setUp(self):
+        """
+        Set up five published questions, two of them published at the
+        same time, and one future question.
+        """
+        super().setUp()
+        now = timezone.now()
+        days = [-5, -4, -3, -3, -1]
+        self.questions = [
+            Question.objects.create(question_text=f"Question {n}",
+                                    pub_date=now + datetime.timedelta(days=d))
+            for n, d in enumerate(days)]
+        Question.objects.create(question_text="Future",
+                                pub_date=now + datetime.timedelta(days=1))
+        self.newest_first = sorted(self.questions,
+                                   key=lambda q: (q.pub_date, q.id),
+                                   reverse=True)
+
+    def get_page(self, cursor=None):
+        """Return the response of the index page at cursor."""
+        data = {'cursor': cursor} if cursor else {}
+        return self.client.get(reverse('polls:index'), data)
+
+    def test_first_page(self):
+        """
+        The first page shows the newest questions and only a next link.
+        """
+        response = self.get_page()
+        page = response.context['page']
+        self.assertEqual(self.newest_first[:2], page.items)
+        self.assertIsNone(page.previous_token)
+        self.assertIsNotNone(page.next_token)
+
+    def test_walk_forward_and_back(self):
+        """
+        Following the next links visits every question once, and the
+        previous links lead back to the same pages.
+        """
+        pages = [self.get_page().context['page']]
+        while pages[-1].next_token:
+            pages.append(self.get_page(pages[-1].next_token).context['page'])
+        seen = [question for page in pages for question in page.items]
+        self.assertEqual(self.newest_first, seen)
+        self.assertEqual(3, len(pages))
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.get_page(page.previous_token).context['page']
+            self.assertEqual(expected.items, page.items)
+        self.assertIsNone(page.previous_token)
+
+    def test_invalid_cursor(self):
+        """
+        An invalid cursor shows the first page.
+        """
+        response = self.get_page("not-a-cursor")
+        self.assertEqual(self.newest_first[:2],
+                         response.context['latest_question_list'])
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+
+    def test_page_is_one_query(self):
+        """
+        A page of questions is read with a single query.
+        """
+        cursor = self.get_page().context['page'].next_token
+        with self.assertNumQueries(1):
+            self.get_page(cursor)
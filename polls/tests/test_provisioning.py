@@ -0,0 +1,81 @@
+"""Tests of password hashing for signup and bulk provisioning."""
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from mysite.hashing import HashingBusy, hash_password, hashing_slot
+
+
+class ProvisionUsersTests(TestCase):
+    def test_provision_from_csv(self):
+        """
+        Accounts of a CSV file are created with hashed passwords, and
+        taken usernames are skipped.
+        """
+        User.objects.create_user(username="taken", password="taken1234")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "students.csv")
+            with open(path, "w") as file:
+                file.write("username,password,first_name\n"
+                           "student1,secret-one,One\n"
+                           "student2,secret-two,Two\n"
+                           "student1,again,Again\n"
+                           "taken,other,Other\n")
+            out = StringIO()
+            call_command('provision_users', path, workers=1, batch_size=2,
+                         stdout=out)
+        self.assertIn("Created 2 users, skipped 2", out.getvalue())
+        student = User.objects.get(username="student1")
+        self.assertEqual("One", student.first_name)
+        self.assertTrue(student.check_password("secret-one"))
+        self.assertTrue(self.client.login(username="student2",
+                                          password="secret-two"))
+
+
+class SignupHashingTests(TestCase):
+    def test_signup_logs_in_without_authenticate(self):
+        """
+        Signup logs the new user in without hashing the password again.
+        """
+        backend = 'django.contrib.auth.backends.ModelBackend'
+        with mock.patch(f'{backend}.authenticate') as authenticate:
+            response = self.client.post(reverse("signup"),
+                                        {"username": "newbie",
+                                         "password1": "TS12345678",
+                                         "password2": "TS12345678"})
+        self.assertRedirects(response, reverse("polls:index"))
+        authenticate.assert_not_called()
+        self.assertEqual(User.objects.get(username="newbie").pk,
+                         int(self.client.session['_auth_user_id']))
+
+    def test_signup_busy(self):
+        """
+        When no hashing slot is free, signup answers 503 and creates
+        no user.
+        """
+        with mock.patch('mysite.forms.hashing_slot',
+                        side_effect=HashingBusy):
+            response = self.client.post(reverse("signup"),
+                                        {"username": "newbie",
+                                         "password1": "TS12345678",
+                                         "password2": "TS12345678"})
+        self.assertEqual(503, response.status_code)
+        self.assertFalse(User.objects.filter(username="newbie").exists())
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=1,
+                       PASSWORD_HASHING_TIMEOUT=0.01)
+    def test_hashing_slots(self):
+        """
+        A hash waits for a free slot and gives up when none frees up.
+        """
+        with mock.patch('mysite.hashing._slots', None):
+            with hashing_slot():
+                with self.assertRaises(HashingBusy):
+                    hash_password("secret")
+            self.assertTrue(hash_password("secret"))
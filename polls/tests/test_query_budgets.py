@@ -0,0 +1,123 @@
+"""Tests of the query budgets and the timing of the polls views."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from mysite.timing import reset_timing_stats, timing_stats
+from polls.models import Choice, Question, Vote
+from polls.tests.budgets import QueryBudgetMixin
+
+# The most queries each view may run for a logged in user, including
+# the session and the user. The index reads the votes of the user for
+# its voted badges.
+BUDGETS = {
+    'index': 4,
+    'detail': 5,
+    'results': 4,
+    'vote': 10,
+}
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        """
+        Set up a logged in user who voted on one of ten questions.
+        """
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="secret")
+        self.client.force_login(self.user)
+        for number in range(10):
+            question = Question.objects.create(
+                question_text=f"Question {number}")
+            for letter in "ABCD":
+                Choice.objects.create(question=question, choice_text=letter)
+        self.question = question
+        self.choice = question.choice_set.first()
+        Vote.objects.record(self.user, self.choice)
+
+    def test_index(self):
+        with self.assertQueryBudget(BUDGETS['index']):
+            self.client.get(reverse('polls:index'))
+
+    def test_detail(self):
+        with self.assertQueryBudget(BUDGETS['detail']):
+            response = self.client.get(
+                reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, f'value="{self.choice.id}"\n'
+                                      f'                   checked')
+
+    def test_results(self):
+        with self.assertQueryBudget(BUDGETS['results']):
+            self.client.get(
+                reverse('polls:results', args=(self.question.id,)))
+
+    def test_vote(self):
+        other = self.question.choice_set.last()
+        with self.assertQueryBudget(BUDGETS['vote']):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                             {'choice': other.id})
+
+    def test_over_budget_fails(self):
+        """
+        A view over its budget fails the test with the list of queries.
+        """
+        with self.assertRaisesMessage(AssertionError, "over the budget"):
+            with self.assertQueryBudget(1):
+                self.client.get(reverse('polls:index'))
+
+
+class QueryTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        reset_timing_stats()
+        self.question = Question.objects.create(question_text="Question")
+        Choice.objects.create(question=self.question, choice_text="A")
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        """
+        The response tells the number of queries and the database,
+        render and total times.
+        """
+        url = reverse('polls:results', args=(self.question.id,))
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_off(self):
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_stats_per_view(self):
+        """
+        The process keeps the totals of each URL name.
+        """
+        for _ in range(3):
+            self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        stats = timing_stats()
+        self.assertEqual(3, stats['polls:index']['requests'])
+        self.assertEqual(1, stats['polls:results']['requests'])
+        self.assertEqual(2, stats['polls:results']['queries'])
+        self.assertGreater(stats['polls:index']['render_time'], 0)
+        self.assertGreater(stats['polls:index']['total_time'],
+                           stats['polls:index']['render_time'])
+
+    @override_settings(ROOT_URLCONF='mysite.asgi_urls',
+                       SERVER_TIMING_HEADER=True)
+    async def test_async_view_queries(self):
+        """
+        The queries the async views run in a thread are counted too.
+        """
+        url = reverse('polls:results', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
@@ -0,0 +1,78 @@
+"""Tests of the Question queryset filters and annotations."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+
+
+class QuestionQuerySetTests(TestCase):
+    def setUp(self):
+        """
+        Set up questions that are upcoming, open, recent and closed.
+        """
+        super().setUp()
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        self.upcoming = Question.objects.create(question_text="Upcoming",
+                                                pub_date=now + day)
+        self.open = Question.objects.create(question_text="Open",
+                                            pub_date=now - 5 * day)
+        self.recent = Question.objects.create(
+            question_text="Recent", pub_date=now - day / 2,
+            end_date=now + day)
+        self.closed = Question.objects.create(
+            question_text="Closed", pub_date=now - 5 * day,
+            end_date=now - day)
+
+    def test_filters(self):
+        """
+        The queryset filters select the same questions as the model
+        methods.
+        """
+        self.assertQuerysetEqual(
+            Question.objects.published().order_by('pk'),
+            [self.open, self.recent, self.closed])
+        self.assertQuerysetEqual(Question.objects.open().order_by('pk'),
+                                 [self.open, self.recent])
+        self.assertQuerysetEqual(Question.objects.closed(), [self.closed])
+        self.assertQuerysetEqual(Question.objects.recent(), [self.recent])
+
+    def test_status_annotations_match_methods(self):
+        """
+        The annotated flags agree with can_vote(), is_published() and
+        was_published_recently() for every question.
+        """
+        for question in Question.objects.with_status():
+            self.assertEqual(question.can_vote(), question.voting_open)
+            self.assertEqual(question.is_published(),
+                             question.is_published_now)
+            self.assertEqual(question.was_published_recently(),
+                             question.published_recently)
+
+    def test_sort_by_voting_status(self):
+        """
+        Questions can be sorted by the annotated voting status.
+        """
+        questions = list(Question.objects.with_status()
+                         .order_by('-voting_open', 'pk'))
+        self.assertEqual([self.open, self.recent],
+                         questions[:2])
+
+    def test_admin_sorts_and_filters_by_status(self):
+        """
+        The admin changelist sorts by the can_vote column and filters by
+        voting status in SQL.
+        """
+        admin = User.objects.create_superuser(username="admin",
+                                              password="admin1234")
+        self.client.force_login(admin)
+        url = reverse('admin:polls_question_changelist')
+        response = self.client.get(url, {'o': '-4', 'status': 'open'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([self.open, self.recent],
+                         sorted(response.context['cl'].result_list,
+                                key=lambda question: question.pk))
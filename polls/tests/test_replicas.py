@@ -0,0 +1,170 @@
+"""Tests of the routing of reads to replicas."""
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import (DEFAULT_DB_ALIAS, connection, connections,
+                       transaction)
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mysite.routers import PIN_COOKIE, ReplicaRouter, pin_to_primary
+from polls.models import Choice, Question, Vote
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_reads_and_writes(self):
+        router = ReplicaRouter()
+        self.assertIn(router.db_for_read(Question), ['replica1', 'replica2'])
+        self.assertEqual(DEFAULT_DB_ALIAS, router.db_for_write(Question))
+
+    def test_pinned_reads(self):
+        with pin_to_primary():
+            self.assertEqual(DEFAULT_DB_ALIAS,
+                             ReplicaRouter().db_for_read(Question))
+
+    def test_migrate_primary_only(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'polls'))
+        self.assertFalse(router.allow_migrate('replica1', 'polls'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(DEFAULT_DB_ALIAS,
+                         ReplicaRouter().db_for_read(Question))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaReadTests(TransactionTestCase):
+    """
+    A replica alias added for these tests reads the test database and
+    stands in for a real replica. The tests commit their data, so that
+    the replica can see it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        connections.settings[REPLICA] = {
+            **primary, 'TEST': {**primary['TEST'], 'MIRROR': DEFAULT_DB_ALIAS}}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Question")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="A")
+        self.user = User.objects.create_user(username="voter",
+                                             password="secret")
+
+    def queries(self, alias, request, *args, **kwargs):
+        """ Return the number of queries of a request on an alias. """
+        with CaptureQueriesContext(connections[alias]) as context:
+            request(*args, **kwargs)
+        return len(context)
+
+    def test_pages_read_replica(self):
+        """
+        The results page reads its question from the replica, while the
+        cached results are filled from the primary.
+        """
+        url = reverse('polls:results', args=(self.question.id,))
+        self.assertGreater(self.queries(DEFAULT_DB_ALIAS, self.client.get,
+                                        url), 0)
+        self.assertEqual(0, self.queries(DEFAULT_DB_ALIAS, self.client.get,
+                                         url))
+        self.assertGreater(self.queries(REPLICA, self.client.get, url), 0)
+
+    def test_read_own_vote(self):
+        """
+        A vote is written to the primary, and the voter reads from the
+        primary until the pin cookie expires.
+        """
+        self.client.force_login(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.assertEqual(0, self.queries(REPLICA, self.client.post, url,
+                                         {'choice': self.choice.id}))
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+
+        results = reverse('polls:results', args=(self.question.id,))
+        self.assertEqual(0, self.queries(REPLICA, self.client.get, results))
+        del self.client.cookies[PIN_COOKIE]
+        self.assertGreater(self.queries(REPLICA, self.client.get, results),
+                           0)
+
+    def test_transaction_reads_primary(self):
+        self.assertEqual(REPLICA, Question.objects.all().db)
+        with transaction.atomic():
+            self.assertEqual(DEFAULT_DB_ALIAS, Question.objects.all().db)
+
+
+@skipUnless(connection.vendor == 'sqlite', "copies a SQLite database")
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class LaggingReplicaTests(TransactionTestCase):
+    """
+    The replica of these tests is an in-memory copy of the test database
+    taken in setUp(), so it lags behind every write made after it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        connections.settings[REPLICA] = {
+            **primary, 'NAME': 'file:lagging?mode=memory&cache=shared'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Question")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="A")
+        self.user = User.objects.create_user(username="voter")
+        connection.ensure_connection()
+        connections[REPLICA].ensure_connection()
+        connection.connection.backup(connections[REPLICA].connection)
+
+    def test_results_after_vote(self):
+        """
+        The results cached after a vote count it, although the replica
+        does not have it yet.
+        """
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        voter = self.client_class()
+        voter.force_login(self.user)
+        voter.post(reverse('polls:vote', args=(self.question.id,)),
+                   {'choice': self.choice.id})
+        self.assertFalse(Vote.objects.using(REPLICA).exists())
+        results = self.client.get(url).context['results']
+        self.assertEqual(1, results['total'])
+
+    def test_index_after_edit(self):
+        """
+        The question list cached after an edit shows it, although the
+        replica does not have it yet.
+        """
+        self.client.get(reverse('polls:index'))
+        self.question.question_text = "Edited question"
+        self.question.save()
+        self.assertContains(self.client.get(reverse('polls:index')),
+                            "Edited question")
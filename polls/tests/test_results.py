@@ -0,0 +1,58 @@
+"""Tests of the cached poll results."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from polls.models import Question, Choice
+
+
+class ResultsViewTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question with two choices and an empty cache.
+        """
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Test question")
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First", votes=3)
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second", votes=1)
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_results_in_one_query(self):
+        """
+        The results of all choices come from one query, and a cached
+        page only looks up the question.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        results = response.context['results']
+        self.assertEqual(4, results['total'])
+        self.assertEqual([75.0, 25.0],
+                         [choice['percent'] for choice in results['choices']])
+        self.assertContains(response, "75.0%")
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_results_without_votes(self):
+        """
+        A question without votes shows 0 percent for every choice.
+        """
+        Choice.objects.update(votes=0)
+        response = self.client.get(self.url)
+        self.assertEqual(0, response.context['results']['total'])
+        self.assertContains(response, "0.0%")
+
+    def test_vote_invalidates_results(self):
+        """
+        After a vote the results page shows the new count.
+        """
+        self.client.get(self.url)
+        User.objects.create_user(username="voter", password="voter1234")
+        self.client.login(username="voter", password="voter1234")
+        vote = reverse('polls:vote', args=(self.question.id,))
+        self.client.post(vote, {"choice": self.second.id})
+        response = self.client.get(self.url)
+        self.assertEqual(5, response.context['results']['total'])
@@ -0,0 +1,85 @@
+"""Tests of the live results stream."""
+import asyncio
+import datetime
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import streams
+from polls.cache import abump_results_version
+from polls.models import Question, Choice
+
+
+@override_settings(ROOT_URLCONF='mysite.asgi_urls',
+                   POLLS_STREAM_INTERVAL=0.01)
+class ResultsStreamTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question with one choice and an empty cache.
+        """
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Test question")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="First", votes=2)
+
+    async def test_stream_sends_results(self):
+        """
+        The stream starts with the current results of the question.
+        """
+        url = reverse('polls:results_stream', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual('text/event-stream', response['Content-Type'])
+        events = response.streaming_content
+        event = await anext(events)
+        await events.aclose()
+        self.assertTrue(event.startswith(b"event: results\n"))
+        data = json.loads(event.split(b"data: ")[1])
+        self.assertEqual(2, data['total'])
+
+    async def test_stream_missing_question(self):
+        """
+        The stream of a missing question returns 404.
+        """
+        url = reverse('polls:results_stream', args=(self.question.id + 1,))
+        response = await self.async_client.get(url)
+        self.assertEqual(404, response.status_code)
+
+    async def test_stream_unpublished_question(self):
+        """
+        The stream of a question that is not published yet returns 404.
+        """
+        question = await Question.objects.acreate(
+            question_text="Future question",
+            pub_date=timezone.now() + datetime.timedelta(days=1))
+        url = reverse('polls:results_stream', args=(question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(404, response.status_code)
+
+    async def test_watchers_share_one_computation(self):
+        """
+        All watchers of a question get the same update, and the results
+        are read once per change of the results version.
+        """
+        results = {'choices': [], 'total': 0}
+        with mock.patch.object(streams, 'aget_results',
+                               mock.AsyncMock(return_value=results)) as read:
+            channel = streams.get_channel(self.question.id)
+            queues = [channel.subscribe() for _ in range(3)]
+            for queue in queues:
+                self.assertIs(results, await queue.get())
+            await asyncio.sleep(0.05)
+            self.assertEqual(1, read.await_count)
+
+            await abump_results_version(self.question.id)
+            for queue in queues:
+                await queue.get()
+            self.assertEqual(2, read.await_count)
+
+            for queue in queues:
+                channel.unsubscribe(queue)
+        self.assertNotIn(channel, streams._channels.values())
@@ -0,0 +1,112 @@
+"""Tests of the scheduler of poll openings and closings."""
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import get_results, question_choices
+from polls.models import Choice, Question, ResultSnapshot, Vote
+from polls.scheduler import next_run, run
+from polls.snapshots import cached_frozen_results
+
+
+def create_question(text, pub_date, end_date=None, **fields):
+    question = Question.objects.create(question_text=text, pub_date=pub_date,
+                                       end_date=end_date, **fields)
+    Choice.objects.create(question=question, choice_text="Yes")
+    return question
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.now = timezone.now()
+
+    def test_warms_polls_about_to_open(self):
+        """
+        The choices and results of a poll opening within the warm-up time
+        are cached, those of later polls are not.
+        """
+        soon = create_question("Soon", self.now + datetime.timedelta(
+            seconds=30))
+        create_question("Later", self.now + datetime.timedelta(days=1))
+        self.assertEqual(1, run(self.now)['warmed'])
+        with self.assertNumQueries(0):
+            get_results(soon.id)
+            question_choices(soon.id)
+
+    def test_compacts_closed_polls(self):
+        """
+        The counter shards of a poll are folded in once it closes.
+        """
+        question = create_question(
+            "Hot", self.now - datetime.timedelta(days=1),
+            self.now + datetime.timedelta(seconds=1), counter_shards=4)
+        Vote.objects.record(User.objects.create(username="voter"),
+                            question.choice_set.get())
+        self.assertEqual(0, run(self.now)['compacted'])
+        later = self.now + datetime.timedelta(seconds=2)
+        self.assertEqual(1, run(later)['compacted'])
+        question.refresh_from_db()
+        self.assertEqual(1, question.total_votes)
+
+    def test_freezes_final_polls(self):
+        """
+        Polls whose results are final are frozen and cached once.
+        """
+        question = create_question("Closed",
+                                   self.now - datetime.timedelta(days=2),
+                                   self.now - datetime.timedelta(days=1))
+        self.assertEqual(1, run(self.now)['frozen'])
+        self.assertTrue(ResultSnapshot.objects.filter(
+            question=question).exists())
+        self.assertIsNotNone(cached_frozen_results(question.id))
+        self.assertEqual(0, run(self.now)['frozen'])
+
+    def test_next_run(self):
+        """
+        The next run is at the earliest warm-up, closing or freezing.
+        """
+        self.assertIsNone(next_run(self.now))
+        opening = self.now + datetime.timedelta(hours=2)
+        create_question("Later", opening)
+        self.assertEqual(opening - datetime.timedelta(seconds=60),
+                         next_run(self.now))
+        closing = self.now + datetime.timedelta(minutes=5)
+        create_question("Open", self.now, closing)
+        self.assertEqual(closing, next_run(self.now))
+        self.assertEqual(closing + datetime.timedelta(seconds=60),
+                         next_run(closing))
+
+    def test_command_once(self):
+        """
+        run_scheduler --once runs once and reports what it did.
+        """
+        create_question("Closed", self.now - datetime.timedelta(days=2),
+                        self.now - datetime.timedelta(days=1))
+        output = StringIO()
+        call_command('run_scheduler', once=True, stdout=output)
+        self.assertIn("froze 1 questions", output.getvalue())
+
+    def test_publication_drops_question_list(self):
+        """
+        A run after the publication of a poll drops the cached question
+        list, so the index shows it.
+        """
+        opening = self.now + datetime.timedelta(minutes=5)
+        create_question("Later", opening)
+        self.client.get(reverse('polls:index'))
+        before = opening - datetime.timedelta(seconds=1)
+        self.assertEqual(0, run(before, since=self.now)['published'])
+        later = opening + datetime.timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(1, run(later, since=before)['published'])
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Later")
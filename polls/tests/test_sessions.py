@@ -0,0 +1,81 @@
+"""Tests that page views and messages do not write sessions."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.models import Choice, Question
+
+ENGINES = [
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'django.contrib.sessions.backends.signed_cookies',
+]
+
+
+class SessionQueriesTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question with a choice and a user.
+        """
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Question")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="A")
+        self.user = User.objects.create_user(username="voter",
+                                             password="secret")
+
+    def session_queries(self, request, *args, **kwargs):
+        """ Return the queries of a request on the session table. """
+        with CaptureQueriesContext(connection) as context:
+            request(*args, **kwargs)
+        return [query['sql'] for query in context.captured_queries
+                if 'django_session' in query['sql']]
+
+    def test_anonymous_pages(self):
+        """
+        Anonymous views of the index and results never touch the session
+        table, also after an error message and with every engine.
+        """
+        for engine in ENGINES:
+            with self.subTest(engine=engine), \
+                    override_settings(SESSION_ENGINE=engine):
+                self.client = self.client_class()
+                self.assertEqual([], self.session_queries(
+                    self.client.get, reverse('polls:index')))
+                self.assertEqual([], self.session_queries(
+                    self.client.get,
+                    reverse('polls:results', args=(self.question.id,))))
+                self.assertEqual([], self.session_queries(
+                    self.client.get,
+                    reverse('polls:detail', args=(self.question.id + 1,)),
+                    follow=True))
+
+    def test_messages_in_cookie(self):
+        """
+        The message of a vote goes to a cookie, not to the session.
+        """
+        self.client.force_login(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {'choice': self.choice.id})
+        writes = [query['sql'] for query in context.captured_queries
+                  if 'django_session' in query['sql']
+                  and not query['sql'].startswith('SELECT')]
+        self.assertEqual([], writes)
+        self.assertIn('messages', response.cookies)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_sessions(self):
+        """
+        With cached sessions, a logged in user's pages read the session
+        from the cache.
+        """
+        self.client.force_login(self.user)
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        self.assertEqual([], self.session_queries(self.client.get, url))
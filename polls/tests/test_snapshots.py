@@ -0,0 +1,139 @@
+"""Tests of the frozen results of closed polls."""
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, ResultSnapshot
+from polls.snapshots import freeze, is_final
+
+
+class FrozenResultsTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question that closed a day ago, with two choices.
+        """
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        self.question = Question.objects.create(
+            question_text="Closed question",
+            pub_date=now - datetime.timedelta(days=2),
+            end_date=now - datetime.timedelta(days=1))
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First", votes=3)
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second", votes=1)
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_closed_poll_shows_results(self):
+        """
+        The results of a closed poll are shown instead of a redirect, and
+        written to a snapshot on the first request.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(4, response.context['results']['total'])
+        self.assertContains(response, "75.0%")
+        self.assertEqual({self.first.pk: 3, self.second.pk: 1},
+                         dict(ResultSnapshot.objects.values_list('choice',
+                                                                 'votes')))
+
+    def test_frozen_results_without_queries(self):
+        """
+        Once frozen, the results page of an anonymous visitor needs no
+        query and can be cached by browsers and proxies.
+        """
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_matching_etag_is_not_modified(self):
+        """
+        A request with the ETag of the frozen results gets 304.
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+
+    def test_etag_survives_cache_clear(self):
+        """
+        The ETag follows the frozen results, not the time they were
+        cached, so it stays the same when the cache is filled again and
+        changes with the text of a choice.
+        """
+        etag = self.client.get(self.url)['ETag']
+        cache.clear()
+        self.assertEqual(etag, self.client.get(self.url)['ETag'])
+        self.first.choice_text = "Renamed"
+        self.first.save()
+        self.assertNotEqual(etag, self.client.get(self.url)['ETag'])
+
+    def test_private_for_users(self):
+        """
+        The results page of a logged in user, which shows the username,
+        is only cached by their browser and has an ETag of its own.
+        """
+        anonymous_etag = self.client.get(self.url)['ETag']
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(anonymous_etag, response['ETag'])
+
+    def test_snapshot_outlives_counter_changes(self):
+        """
+        Results served after freezing come from the snapshot.
+        """
+        self.client.get(self.url)
+        Choice.objects.filter(pk=self.first.pk).update(votes=100)
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(4, response.context['results']['total'])
+
+    def test_edit_invalidates_frozen_results(self):
+        """
+        Editing the question drops the cached page, and reopening it
+        serves live results again.
+        """
+        self.client.get(self.url)
+        self.question.question_text = "Renamed question"
+        self.question.save()
+        self.assertContains(self.client.get(self.url), "Renamed question")
+        self.question.end_date = None
+        self.question.save()
+        response = self.client.get(self.url)
+        self.assertNotIn('Cache-Control', response)
+
+    def test_recently_closed_poll_is_not_frozen(self):
+        """
+        A poll that closed within POLLS_RESULTS_FREEZE_DELAY seconds shows
+        live results, votes may still be on their way from the buffer.
+        """
+        self.question.end_date = timezone.now()
+        self.question.save()
+        self.assertFalse(is_final(self.question))
+        with self.assertRaises(ValueError):
+            freeze(self.question)
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_freeze_results_command(self):
+        """
+        freeze_results writes the snapshots of every closed poll once.
+        """
+        call_command('freeze_results', stdout=StringIO())
+        self.assertEqual(2, ResultSnapshot.objects.count())
+        output = StringIO()
+        call_command('freeze_results', stdout=output)
+        self.assertIn("0 questions", output.getvalue())
@@ -0,0 +1,139 @@
+"""Tests of the SQLite high-concurrency backend and the vote retries."""
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from mysite.db import retry_on_locked
+from mysite.sqlite3.base import DatabaseWrapper
+from polls.models import Choice, Question, Vote
+
+
+class HighConcurrencyBackendTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def settings_dict(self):
+        return {**connection.settings_dict, 'ENGINE': 'mysite.sqlite3',
+                'NAME': self.path, 'OPTIONS': {}}
+
+    def database(self):
+        database = DatabaseWrapper(self.settings_dict())
+        self.addCleanup(database.close)
+        return database
+
+    @override_settings(SQLITE_BUSY_TIMEOUT=1234)
+    def test_pragmas(self):
+        """
+        Every connection uses WAL, synchronous NORMAL and the busy timeout.
+        """
+        with self.database().cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual('wal', cursor.fetchone()[0])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(1, cursor.fetchone()[0])
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(1234, cursor.fetchone()[0])
+
+    def test_transaction_takes_write_lock(self):
+        """
+        A transaction holds the write lock from its start.
+        """
+        database = self.database()
+        database.ensure_connection()
+        database._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError,
+                                      'database is locked'):
+            other.execute('BEGIN IMMEDIATE')
+        database.connection.rollback()
+
+    def test_concurrent_writers(self):
+        """
+        Transactions that read and then write from many threads all
+        succeed, none is lost to a lock error.
+        """
+        with self.database().cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (n INTEGER)')
+            cursor.execute('INSERT INTO counter VALUES (0)')
+        errors = []
+
+        def increment():
+            database = DatabaseWrapper(self.settings_dict())
+            try:
+                for _ in range(25):
+                    database.ensure_connection()
+                    database._start_transaction_under_autocommit()
+                    with database.cursor() as cursor:
+                        cursor.execute('SELECT n FROM counter')
+                        n = cursor.fetchone()[0]
+                        cursor.execute('UPDATE counter SET n = %s', [n + 1])
+                    database.connection.commit()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                database.close()
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        with self.database().cursor() as cursor:
+            cursor.execute('SELECT n FROM counter')
+            self.assertEqual(200, cursor.fetchone()[0])
+
+
+@override_settings(DATABASE_LOCK_RETRIES=2, DATABASE_LOCK_BACKOFF=0)
+class RetryOnLockedTests(SimpleTestCase):
+    def test_retries_lock_errors(self):
+        func = mock.Mock(side_effect=[OperationalError('database is locked'),
+                                      OperationalError('database is locked'),
+                                      'saved'])
+        self.assertEqual('saved', retry_on_locked(func, 1, key=2))
+        self.assertEqual(3, func.call_count)
+        func.assert_called_with(1, key=2)
+
+    def test_gives_up(self):
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(func)
+        self.assertEqual(3, func.call_count)
+
+    def test_other_errors(self):
+        func = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(func)
+        self.assertEqual(1, func.call_count)
+
+
+@override_settings(DATABASE_LOCK_RETRIES=1, DATABASE_LOCK_BACKOFF=0)
+class LockedVoteTests(TestCase):
+    def test_vote_busy(self):
+        """
+        A vote that stays locked asks the user to vote again.
+        """
+        user = User.objects.create_user(username="voter", password="secret")
+        question = Question.objects.create(question_text="Question")
+        choice = Choice.objects.create(question=question, choice_text="A")
+        self.client.force_login(user)
+        with mock.patch.object(Vote.objects, 'record', side_effect=(
+                OperationalError('database is locked'))) as record:
+            response = self.client.post(
+                reverse('polls:vote', args=(question.id,)),
+                {'choice': choice.id}, follow=True)
+        self.assertEqual(2, record.call_count)
+        self.assertRedirects(response,
+                             reverse('polls:detail', args=(question.id,)))
+        self.assertContains(response, "The poll is busy, please vote again.")
@@ -0,0 +1,123 @@
+"""Tests of the write-behind vote buffer."""
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.buffer import get_vote_buffer
+from polls.cache import vote_map
+from polls.metrics import VOTE_BUFFER_DEPTH
+from polls.models import Question, Choice, Vote
+
+
+class VoteBufferTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question with two choices, a logged in user and
+        an empty vote buffer file.
+        """
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        buffered = override_settings(
+            POLLS_VOTE_BUFFER=True,
+            POLLS_VOTE_BUFFER_PATH=os.path.join(directory.name, "votes.db"))
+        buffered.enable()
+        self.addCleanup(buffered.disable)
+
+        self.user = User.objects.create_user(username="voter",
+                                             password="voter1234")
+        self.question = Question.objects.create(question_text="Test question")
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.client.login(username="voter", password="voter1234")
+
+    def vote_for(self, choice):
+        """Submit a vote for choice as the logged in user."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        return self.client.post(url, {"choice": choice.id})
+
+    def test_vote_is_buffered(self):
+        """
+        A vote is queued in the buffer instead of written to the database.
+        """
+        response = self.vote_for(self.first)
+        self.assertRedirects(response, reverse('polls:results',
+                                               args=(self.question.id,)))
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(1, len(get_vote_buffer()))
+
+    def test_buffered_vote_in_vote_map(self):
+        """
+        The cached votes of the user show a buffered vote before it is
+        written to the database.
+        """
+        cache.clear()
+        vote_map(self.user.pk)
+        self.vote_for(self.second)
+        self.assertEqual({self.question.pk: self.second.pk},
+                         vote_map(self.user.pk))
+
+    def test_flush_drops_stale_vote_map(self):
+        """
+        A page shown between accepting and flushing a vote may cache the
+        votes of the user without it, the flush drops them.
+        """
+        cache.clear()
+        self.vote_for(self.second)
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.client.get(url)
+        call_command('flush_votes', once=True)
+        self.assertEqual(0, VOTE_BUFFER_DEPTH.samples()[0][1])
+        self.assertEqual({self.question.pk: self.second.pk},
+                         vote_map(self.user.pk))
+        self.assertContains(self.client.get(url), "checked")
+
+    def test_flush_keeps_last_vote(self):
+        """
+        Flushing the buffer keeps only the last vote of a user
+        and updates the counters once.
+        """
+        self.vote_for(self.first)
+        self.vote_for(self.second)
+        call_command('flush_votes', once=True)
+        vote = Vote.objects.get(user=self.user)
+        self.assertEqual(self.second, vote.choice)
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(1, self.second.votes)
+        self.assertEqual(1, self.question.total_votes)
+        self.assertEqual(0, len(get_vote_buffer()))
+
+    def test_flush_changes_existing_vote(self):
+        """
+        A buffered vote replaces a vote that is already in the database.
+        """
+        Vote.objects.record(self.user, self.first)
+        self.vote_for(self.second)
+        call_command('flush_votes', once=True, batch_size=1)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(0, self.first.votes)
+        self.assertEqual(1, self.second.votes)
+        self.assertEqual(1, Vote.objects.count())
+
+    def test_flush_twice_is_harmless(self):
+        """
+        Writing the same batch again does not count the votes twice.
+        """
+        self.vote_for(self.first)
+        buffer = get_vote_buffer()
+        pending = buffer.peek(10)
+        buffer.flush(10)
+        for _, user_id, question_id, choice_id in pending:
+            buffer.append(user_id, question_id, choice_id)
+        buffer.flush(10)
+        self.first.refresh_from_db()
+        self.assertEqual(1, self.first.votes)
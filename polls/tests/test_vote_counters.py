@@ -0,0 +1,183 @@
+"""Tests of the vote counters of Choice and Question."""
+import threading
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+
+from polls.models import Question, Choice, Vote
+
+
+class VoteCounterTests(TestCase):
+    def setUp(self):
+        """
+        Set up a question with two choices and a logged in user.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username="voter",
+                                             password="voter1234")
+        self.question = Question.objects.create(question_text="Test question")
+        self.first = Choice.objects.create(question=self.question,
+                                           choice_text="First")
+        self.second = Choice.objects.create(question=self.question,
+                                            choice_text="Second")
+        self.client.login(username="voter", password="voter1234")
+
+    def vote_for(self, choice):
+        """Submit a vote for choice as the logged in user."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        return self.client.post(url, {"choice": choice.id})
+
+    def test_vote_increments_counters(self):
+        """
+        A new vote adds one to the choice and to the question total.
+        """
+        self.vote_for(self.first)
+        self.first.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(1, self.first.votes)
+        self.assertEqual(1, self.question.total_votes)
+
+    def test_change_vote_moves_counter(self):
+        """
+        Changing a vote moves one vote from the old choice to the new one
+        and leaves the question total unchanged.
+        """
+        self.vote_for(self.first)
+        self.vote_for(self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(0, self.first.votes)
+        self.assertEqual(1, self.second.votes)
+        self.assertEqual(1, self.question.total_votes)
+
+    def test_same_vote_twice(self):
+        """
+        Voting for the same choice again does not change the counters.
+        """
+        self.vote_for(self.first)
+        self.vote_for(self.first)
+        self.first.refresh_from_db()
+        self.assertEqual(1, self.first.votes)
+        self.assertEqual(1, Vote.objects.count())
+
+    def test_reconcile_repairs_drift(self):
+        """
+        reconcile_votes rebuilds counters that do not match the Vote rows.
+        """
+        Vote.objects.create(user=self.user, question=self.question,
+                            choice=self.second)
+        Choice.objects.filter(pk=self.first.pk).update(votes=7)
+        call_command('reconcile_votes', chunk_size=1, stdout=StringIO())
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(0, self.first.votes)
+        self.assertEqual(1, self.second.votes)
+        self.assertEqual(1, self.question.total_votes)
+
+    def test_one_vote_per_user_per_question(self):
+        """
+        The database rejects a second Vote row for the same user
+        and question.
+        """
+        Vote.objects.create(user=self.user, question=self.question,
+                            choice=self.first)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, question=self.question,
+                                choice=self.second)
+
+    def test_record_upserts_vote(self):
+        """
+        Recording a vote for another choice updates the existing row
+        in place instead of adding a new one.
+        """
+        Vote.objects.record(self.user, self.first)
+        Vote.objects.record(self.user, self.second)
+        vote = Vote.objects.get(user=self.user, question=self.question)
+        self.assertEqual(self.second, vote.choice)
+        self.assertEqual(1, Vote.objects.count())
+
+    def test_insert_skips_existing_vote(self):
+        """
+        A first vote that finds the row of a concurrent first vote writes
+        nothing, so record() counts the vote once.
+        """
+        vote = Vote(user=self.user, question=self.question,
+                    choice=self.first)
+        self.assertTrue(Vote.objects._insert(vote))
+        self.assertFalse(Vote.objects._insert(vote))
+        self.assertEqual(1, Vote.objects.count())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentVoteTests(TransactionTestCase):
+    """
+    Votes from many connections at once, on databases with row locks
+    such as PostgreSQL. SQLite runs one writer at a time anyway.
+    """
+
+    def test_concurrent_votes_keep_counters(self):
+        question = Question.objects.create(question_text="Busy question")
+        first = Choice.objects.create(question=question, choice_text="First")
+        second = Choice.objects.create(question=question,
+                                       choice_text="Second")
+        users = [User.objects.create(username=f"voter{number}")
+                 for number in range(20)]
+        errors = []
+
+        def vote(user):
+            try:
+                Vote.objects.record(user, first)
+                Vote.objects.record(user, second)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(user,))
+                   for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        question.refresh_from_db()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(20, question.total_votes)
+        self.assertEqual((0, 20), (first.votes, second.votes))
+        self.assertEqual(20, Vote.objects.filter(choice=second).count())
+
+    def test_double_click_counts_once(self):
+        question = Question.objects.create(question_text="Busy question")
+        choice = Choice.objects.create(question=question, choice_text="Yes")
+        user = User.objects.create(username="voter")
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def vote():
+            try:
+                barrier.wait()
+                Vote.objects.record(user, choice)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        question.refresh_from_db()
+        choice.refresh_from_db()
+        self.assertEqual((1, 1), (question.total_votes, choice.votes))
+        self.assertEqual(1, Vote.objects.count())
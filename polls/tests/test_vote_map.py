@@ -0,0 +1,93 @@
+"""Tests of the cached votes of each user."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import vote_map
+from polls.counters import reset
+from polls.models import Choice, Question, Vote
+
+
+class VoteMapTests(TestCase):
+    def setUp(self):
+        """
+        Set up two published questions with two choices each and a
+        logged in user who voted on the first one.
+        """
+        super().setUp()
+        cache.clear()
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        self.voted = Question.objects.create(question_text="Voted",
+                                             pub_date=yesterday)
+        self.other = Question.objects.create(question_text="Other",
+                                             pub_date=yesterday)
+        self.choices = {
+            question: [Choice.objects.create(question=question,
+                                             choice_text=text)
+                       for text in ("Yes", "No")]
+            for question in (self.voted, self.other)}
+        self.user = User.objects.create_user(username="voter")
+        Vote.objects.record(self.user, self.choices[self.voted][1])
+        self.client.force_login(self.user)
+
+    def test_vote_map_cached(self):
+        """
+        The votes of a user are read in one query, then from the cache.
+        """
+        with self.assertNumQueries(1):
+            votes = vote_map(self.user.pk)
+        self.assertEqual({self.voted.pk: self.choices[self.voted][1].pk},
+                         votes)
+        with self.assertNumQueries(0):
+            vote_map(self.user.pk)
+
+    def test_detail_checks_previous_vote_without_query(self):
+        """
+        Once the votes are cached, the detail page marks the previous
+        vote without a query for it.
+        """
+        url = reverse('polls:detail', args=(self.voted.id,))
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(self.choices[self.voted][1].pk,
+                         response.context['voted_choice_id'])
+        self.assertContains(response, "checked")
+
+    def test_index_badges(self):
+        """
+        The index marks the questions the user voted on, anonymous
+        visitors get no badges.
+        """
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, '<span class="badge voted">Voted',
+                            count=1)
+        self.assertContains(response, 'Not voted', count=1)
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('polls:index')),
+                               'Your vote')
+
+    def test_vote_invalidates_map(self):
+        """
+        After a vote the detail page and the index show it.
+        """
+        vote_map(self.user.pk)
+        choice = self.choices[self.other][0]
+        self.client.post(reverse('polls:vote', args=(self.other.id,)),
+                         {'choice': choice.id})
+        self.assertEqual(choice.pk, vote_map(self.user.pk)[self.other.pk])
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, '<span class="badge voted">Voted',
+                            count=2)
+
+    def test_reset_invalidates_map(self):
+        """
+        Deleting the votes of a question drops the maps of its voters.
+        """
+        vote_map(self.user.pk)
+        reset([self.voted.pk])
+        self.assertEqual({}, vote_map(self.user.pk))
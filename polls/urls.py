@@ -7,4 +7,6 @@ urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('<int:pk>/', views.DetailView.as_view(), name='detail'),
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'), ]
+    path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('export/', views.export_votes, name='export'),
+    path('<int:pk>/export/', views.export_votes, name='export_question'), ]
@@ -1,12 +1,24 @@
-from django.http import HttpResponseRedirect, Http404
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, Http404
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.views import generic
-from django.utils import timezone
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.views import redirect_to_login
+from django.conf import settings
+from django.db import OperationalError
 
-from .models import Choice, Question, Vote
+from mysite.db import is_locked, retry_on_locked
+
+from .buffer import get_vote_buffer
+from .cache import (bump_results_version, find_choice, forget_vote_maps,
+                    get_results, question_choices, remember_vote, vote_map)
+from .exports import export, export_options, export_response, vote_rows
+from .metrics import VOTES_ACCEPTED, VOTES_REJECTED
+from .models import Question, Vote
+from .fragments import index_fragment, question_table
+from .snapshots import (cached_frozen_results, frozen_response,
+                        frozen_results, is_final)
 
 
 class IndexView(generic.ListView):
@@ -15,11 +27,24 @@ class IndexView(generic.ListView):
 
     def get_queryset(self):
         """
-        Return all published questions.
+        Return a page of published questions, newest first, from the
+        cached question table.
         """
-        return Question.objects.filter(
-            pub_date__lte=timezone.now()
-        ).order_by('-pub_date')
+        self.fragment = index_fragment(self.request.GET.get('cursor'))
+        return self.fragment['page'].items
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the cursors of the next and previous pages and the rendered
+        question table, with voted badges for a logged in user.
+        """
+        context = super().get_context_data(**kwargs)
+        context['page'] = self.fragment['page']
+        votes = None
+        if self.request.user.is_authenticated:
+            votes = vote_map(self.request.user.pk)
+        context['question_table'] = question_table(self.fragment, votes)
+        return context
 
 
 class DetailView(generic.DetailView):
@@ -30,7 +55,7 @@ class DetailView(generic.DetailView):
         """
         Excludes any questions that aren't published yet.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
 
     def get(self, request, *args, **kwargs):
         """
@@ -45,21 +70,18 @@ class DetailView(generic.DetailView):
                                     f" does not exist.")
             return redirect("polls:index")
 
-        this_user = request.user
-        try:
-            prev_vote = Vote.objects.get(user=this_user,
-                                         choice__question=question)
-        except (Vote.DoesNotExist, TypeError):
-            prev_vote = None
-
         if not question.can_vote():
             messages.error(request, f"Poll question {kwargs['pk']}"
                                     f" does not allow voting.")
             return redirect("polls:index")
-        else:
-            return render(request, self.template_name,
-                          {"question": question,
-                           "prev_vote": prev_vote})
+
+        voted_choice_id = None
+        if request.user.is_authenticated:
+            voted_choice_id = vote_map(request.user.pk).get(question.id)
+        return render(request, self.template_name,
+                      {"question": question,
+                       "choices": question_choices(question.id),
+                       "voted_choice_id": voted_choice_id})
 
 
 class ResultsView(generic.DetailView):
@@ -71,7 +93,12 @@ class ResultsView(generic.DetailView):
         Handles the HTTP GET request for the poll result page.
         It will be redirected to the poll index page only if
         the poll question does not exist or has not been opened yet.
+        Closed polls are served from their frozen results.
         """
+        frozen = cached_frozen_results(kwargs['pk'])
+        if frozen is not None:
+            return frozen_response(request, self.template_name, frozen)
+
         try:
             question = get_object_or_404(Question, pk=kwargs['pk'])
         except (Question.DoesNotExist, Http404):
@@ -79,44 +106,82 @@ class ResultsView(generic.DetailView):
                                     f" does not exist.")
             return redirect("polls:index")
 
-        if not question.can_vote():
+        if not question.is_published():
             messages.error(request, f"Poll question {kwargs['pk']}"
                                     f" has not been opened yet.")
             return redirect("polls:index")
-        else:
-            return render(request, self.template_name,
-                          {"question": question})
+        if is_final(question):
+            return frozen_response(request, self.template_name,
+                                   frozen_results(question))
+        return render(request, self.template_name,
+                      {"question": question,
+                       "results": get_results(question.id)})
 
 
-@login_required
 def vote(request, question_id):
     """
     Handles user voting for a specific poll question.
     """
-    question = get_object_or_404(Question, pk=question_id)
+    if not request.user.is_authenticated:
+        VOTES_REJECTED.inc(reason='unauthenticated')
+        return redirect_to_login(request.get_full_path())
+
+    try:
+        question = get_object_or_404(Question, pk=question_id)
+    except Http404:
+        VOTES_REJECTED.inc(reason='missing_question')
+        raise
 
     if not question.can_vote():
+        VOTES_REJECTED.inc(reason='closed_poll')
         messages.error(request, f"Poll question {question_id}"
                                 f" does not allow voting.")
         return redirect("polls:index")
 
-    try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-    except (KeyError, Choice.DoesNotExist):
+    selected_choice = find_choice(question, request.POST.get('choice'),
+                                  question_choices(question.id))
+    if selected_choice is None:
+        VOTES_REJECTED.inc(reason='missing_choice')
         messages.error(request, "Please select choice")
         return redirect("polls:detail", pk=question_id)
 
-    this_user = request.user
-    try:
-        # find a vote for this user and this question.
-        vote = Vote.objects.get(user=this_user, choice__question=question)
-        # update this vote
-        vote.choice = selected_choice
-    except Vote.DoesNotExist:
-        # no matching vote - create a new Vote
-        vote = Vote(user=this_user, choice=selected_choice)
-
-    vote.save()
-    messages.success(request, f"Your choice ( {vote.choice} ) has been saved.")
+    if settings.POLLS_VOTE_BUFFER:
+        get_vote_buffer().append(request.user.pk, question.id,
+                                 selected_choice.id)
+        remember_vote(request.user.pk, question.id, selected_choice.id)
+    else:
+        try:
+            retry_on_locked(Vote.objects.record, request.user,
+                            selected_choice)
+        except OperationalError as error:
+            if not is_locked(error):
+                raise
+            VOTES_REJECTED.inc(reason='database_locked')
+            messages.error(request, "The poll is busy, please vote again.")
+            return redirect("polls:detail", pk=question_id)
+        bump_results_version(question.id)
+        forget_vote_maps(request.user.pk)
+    VOTES_ACCEPTED.inc()
+    messages.success(request,
+                     f"Your choice ( {selected_choice} ) has been saved.")
 
     return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+
+
+@staff_member_required
+def export_votes(request, pk=None):
+    """
+    Stream the votes of all questions, or of question pk, as a CSV or
+    JSON Lines file. The query parameters format, gzip, since and until
+    choose the format and the date range.
+    """
+    try:
+        filters, exporter = export_options(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if pk is not None:
+        get_object_or_404(Question, pk=pk)
+    name = f"votes-{pk}" if pk is not None else "votes"
+    return export_response(
+        export(vote_rows(question_id=pk, **filters), exporter),
+        exporter, name)